@@ -0,0 +1,41 @@
+# bench_startup.py - Measure model import time and CLI time-to-menu
+#
+# Run from the repository root:  python benchmarks/bench_startup.py [runs]
+# Every sample is a fresh interpreter. The CLI sample starts main.py, waits for the
+# menu and exits (option 33), so it measures startup cost only. Backends do not
+# need to be running; with lazy connections the menu appears regardless.
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLES = {
+    "import models": [sys.executable, "-c",
+                      "import models.mongo_model, models.cassandra_model, models.dgraph_model"],
+    "main.py to menu": [sys.executable, "main.py"],
+}
+
+
+def time_command(cmd, stdin):
+    start = time.perf_counter()
+    result = subprocess.run(cmd, cwd=ROOT, input=stdin, capture_output=True, text=True)
+    return time.perf_counter() - start, result.returncode
+
+
+def main(runs=5):
+    for name, cmd in SAMPLES.items():
+        timings, codes = [], set()
+        for _ in range(runs):
+            elapsed, code = time_command(cmd, "33\n")
+            timings.append(elapsed)
+            codes.add(code)
+        print(f"{name:<18} median {statistics.median(timings) * 1000:7.1f} ms  "
+              f"min {min(timings) * 1000:7.1f} ms  exit codes {sorted(codes)}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
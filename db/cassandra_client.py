@@ -1,14 +1,10 @@
-from cassandra.cluster import Cluster
+from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
+from cassandra.query import tuple_factory
 import os
 import logging
 import models.cassandra_model as cassandra_model
 
-# Set logger
 log = logging.getLogger()
-log.setLevel('INFO')
-handler = logging.FileHandler('investments.log')
-handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
-log.addHandler(handler)
 
 # Read env vars related to Cassandra App
 CLUSTER_IPS = os.getenv('CASSANDRA_CLUSTER_IPS', 'localhost')
@@ -20,7 +16,10 @@ def get_cassandra_session():
     Connect to the Cassandra cluster and return a session object.
     """
     log.info("Connecting to Cluster")
-    cluster = Cluster(CLUSTER_IPS.split(','))
+    cluster = Cluster(CLUSTER_IPS.split(','), execution_profiles={
+        EXEC_PROFILE_DEFAULT: ExecutionProfile(),
+        cassandra_model.TUPLE_ROWS: ExecutionProfile(row_factory=tuple_factory),
+    })
     session = cluster.connect()
 
     # Create keyspace and schema using cassandra_model
@@ -0,0 +1,98 @@
+import threading
+
+# Process-wide connection registry. Each backend is connected on first use and
+# the same handle is returned afterwards; nothing here touches the network at
+# import time, and driver imports are deferred until a backend is needed.
+
+_instances = {}
+_lock = threading.Lock()
+
+
+def _get(name, connect):
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = connect()
+    return instance
+
+
+def _connect_mongo():
+    from db.mongo_client import get_mongo_db
+    return get_mongo_db()
+
+
+def _connect_cassandra():
+    from db.cassandra_client import get_cassandra_session
+    return get_cassandra_session()
+
+
+def mongo_db():
+    return _get("mongo", _connect_mongo)
+
+
+def cassandra_session():
+    return _get("cassandra", _connect_cassandra)
+
+
+def dgraph_client():
+    from db.dgraph_client import get_dgraph_client
+    return get_dgraph_client()
+
+
+# asyncio handles used by models/aio. The Motor client binds to the event loop
+# that first uses it, so these are meant for a single long-running loop.
+def _connect_async_mongo():
+    from db.mongo_client import get_async_mongo_db
+    return get_async_mongo_db()
+
+
+def async_mongo_db():
+    return _get("async_mongo", _connect_async_mongo)
+
+
+def async_dgraph_client():
+    from db.dgraph_client import get_async_dgraph_client
+    return get_async_dgraph_client()
+
+
+def close_all():
+    """
+    Close every backend opened through the registry.
+    """
+    with _lock:
+        db = _instances.pop("mongo", None)
+        if db is not None:
+            db.client.close()
+        session = _instances.pop("cassandra", None)
+        if session is not None:
+            session.cluster.shutdown()
+    from db.dgraph_client import close_dgraph_client
+    close_dgraph_client()
+
+
+async def close_all_async():
+    """
+    Close the asyncio handles, then everything close_all() covers.
+    """
+    with _lock:
+        db = _instances.pop("async_mongo", None)
+    if db is not None:
+        db.client.close()
+    from db.dgraph_client import close_async_dgraph_client
+    await close_async_dgraph_client()
+    close_all()
+
+
+class LazyConnection:
+    """
+    Module-level stand-in for a connection: the first attribute access calls
+    `connect()` (e.g. mongo_db) and every access is forwarded to its result.
+    """
+
+    def __init__(self, connect):
+        self._connect = connect
+
+    def __getattr__(self, name):
+        return getattr(self._connect(), name)
@@ -1,8 +1,93 @@
 import os
+import atexit
+import itertools
+import threading
 import pydgraph
 
+# Comma-separated list of Dgraph alpha endpoints, e.g. "alpha1:9080,alpha2:9080"
 DGRAPH_URI = os.getenv("DGRAPH_URI", "localhost:9080")
 
+# gRPC channel options for the long-lived stubs (keep idle channels warm)
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+]
+
+_client = None
+_stubs = []
+_async_client = None
+_async_stubs = []
+_lock = threading.Lock()
+
+
+class RoundRobinDgraphClient(pydgraph.DgraphClient):
+    """
+    DgraphClient that hands out its stubs in round-robin order instead of at random.
+    """
+
+    def __init__(self, *stubs):
+        super().__init__(*stubs)
+        self._cycle = itertools.cycle(stubs)
+        self._cycle_lock = threading.Lock()
+
+    def any_client(self):
+        with self._cycle_lock:
+            return next(self._cycle)
+
+
 def create_dgraph_client():
-    stub = pydgraph.DgraphClientStub(DGRAPH_URI)
+    stub = pydgraph.DgraphClientStub(DGRAPH_URI.split(',')[0].strip())
     return pydgraph.DgraphClient(stub), stub
+
+
+def get_dgraph_client():
+    """
+    Return the process-wide Dgraph client, opening one channel per alpha on first use.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                addrs = [addr.strip() for addr in DGRAPH_URI.split(',') if addr.strip()]
+                _stubs.extend(pydgraph.DgraphClientStub(addr, options=CHANNEL_OPTIONS) for addr in addrs)
+                _client = RoundRobinDgraphClient(*_stubs)
+    return _client
+
+
+def close_dgraph_client():
+    """
+    Close the shared Dgraph channels. Safe to call more than once.
+    """
+    global _client
+    with _lock:
+        for stub in _stubs:
+            stub.close()
+        _stubs.clear()
+        _client = None
+
+
+def get_async_dgraph_client():
+    """
+    Return the process-wide asyncio Dgraph client (grpc.aio channels, one per alpha).
+    """
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                addrs = [addr.strip() for addr in DGRAPH_URI.split(',') if addr.strip()]
+                _async_stubs.extend(pydgraph.AsyncDgraphClientStub(addr, options=CHANNEL_OPTIONS) for addr in addrs)
+                _async_client = pydgraph.AsyncDgraphClient(*_async_stubs)
+    return _async_client
+
+
+async def close_async_dgraph_client():
+    global _async_client
+    stubs = list(_async_stubs)
+    _async_stubs.clear()
+    _async_client = None
+    for stub in stubs:
+        await stub.close()
+
+
+atexit.register(close_dgraph_client)
@@ -0,0 +1,14 @@
+import logging
+
+# Kept apart from the database clients so entry points can set up logging
+# without importing any driver.
+
+def configure_logging():
+    """
+    Send INFO logs to investments.log. Called by entry points, not on import.
+    """
+    log = logging.getLogger()
+    log.setLevel('INFO')
+    handler = logging.FileHandler('investments.log')
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+    log.addHandler(handler)
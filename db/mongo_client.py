@@ -6,3 +6,9 @@ MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 def get_mongo_db():
     client = MongoClient(MONGO_URI)
     return client["online_edu"]  # your database name
+
+def get_async_mongo_db():
+    # Imported here so the sync code path never loads motor
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(MONGO_URI)
+    return client["online_edu"]
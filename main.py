@@ -5,24 +5,27 @@ from models.mongo_model import (
     add_lesson_to_course, create_lesson, create_quiz, create_certificate,
     login_user, logout_user, add_bookmark, remove_bookmark,
     set_language_preference, search_courses, browse_courses_by_category,
-    get_course_details, create_password_reset, reset_password
+    get_course_details_full, create_password_reset, reset_password, LIST_VIEW_PROJECTION
 )
 from models.cassandra_model import (
     track_lesson_completion, log_quiz_attempt, update_performance_summary,
-    get_performance_summary, get_quiz_results, log_session, log_user_activity
+    get_performance_summary, get_quiz_results, log_session, log_user_activity, send_message
 )
 from models.dgraph_model import (
     enroll_student, instructor_teaches, submit_assignment,
-    student_follows_instructor, message_between_users,
+    student_follows_instructor,
     recommend_courses, create_forum_post, reply_to_post,
     add_prerequisite, mark_course_completed
 )
 
-from db.cassandra_client import get_cassandra_session
-from db.mongo_client import get_mongo_db
-from db.dgraph_client import create_dgraph_client
+from db.logging_config import configure_logging
+from db.connections import cassandra_session, close_all
 from datetime import datetime
 
+# Courses listed by the search and browse options; small, projected lists are
+# served from the course cache
+COURSE_LIST_LIMIT = 20
+
 
 def print_menu():
     options = {
@@ -42,7 +45,7 @@ def print_menu():
         14: "Instructor Teaches Course (Dgraph)",
         15: "Submit Assignment (Dgraph)",
         16: "Student Follows Instructor (Dgraph)",
-        17: "Message Between Users (Dgraph)",
+        17: "Send Message (Cassandra)",
         18: "Recommend Courses (Dgraph)",
         19: "Create Forum Post (Dgraph)",
         20: "Reply to Forum Post (Dgraph)",
@@ -67,9 +70,8 @@ def print_menu():
 
 
 def main():
-    cass_session = get_cassandra_session()
-    mongo_db = get_mongo_db()
-    dgraph_client, dgraph_stub = create_dgraph_client()
+    # Backends are connected lazily, the first time a menu option needs them
+    configure_logging()
     while True:
         print_menu()
         choice = int(input("Select an option: "))
@@ -91,24 +93,24 @@ def main():
                                                  "answer_options": input("Options (comma-separated): ").split(','),
                                                  "correct_answer": input("Correct Answer: ") }])
         elif choice == 7:
-            track_lesson_completion(cass_session, input("User ID: "), input("Course ID: "),
+            track_lesson_completion(cassandra_session(), input("User ID: "), input("Course ID: "),
                                     input("Lesson ID: "), float(input("Score (or 0): ") or 0))
         elif choice == 8:
-            log_quiz_attempt(cass_session, input("User ID: "), input("Quiz ID: "),
+            log_quiz_attempt(cassandra_session(), input("User ID: "), input("Quiz ID: "),
                              float(input("Score: ")), {})
         elif choice == 9:
-            update_performance_summary(cass_session, input("User ID: "), input("Course ID: "),
+            update_performance_summary(cassandra_session(), input("User ID: "), input("Course ID: "),
                                        float(input("Avg Score: ")), int(input("Lessons Completed: ")),
                                        int(input("Total Lessons: ")))
         elif choice == 10:
-            print(get_performance_summary(cass_session, input("User ID: "), input("Course ID: ")))
+            print(get_performance_summary(cassandra_session(), input("User ID: "), input("Course ID: ")))
         elif choice == 11:
-            print(get_quiz_results(cass_session, input("User ID: "), input("Quiz ID: ")))
+            print(get_quiz_results(cassandra_session(), input("User ID: "), input("Quiz ID: ")))
         elif choice == 12:
-            log_session(cass_session, input("User ID: "), datetime.utcnow(),
+            log_session(cassandra_session(), input("User ID: "), datetime.utcnow(),
                         datetime.utcnow(), int(input("Duration (min): ")), input("Device Info: "))
         elif choice == 13:
-            enroll_student(input("Student ID: "), input("Course ID: "))
+            enroll_student(input("Student ID: "), input("Course ID: "), check_prerequisites=True)
         elif choice == 14:
             instructor_teaches(input("Instructor ID: "), input("Course ID: "))
         elif choice == 15:
@@ -116,7 +118,8 @@ def main():
         elif choice == 16:
             student_follows_instructor(input("Student ID: "), input("Instructor ID: "))
         elif choice == 17:
-            message_between_users(input("Sender ID: "), input("Receiver ID: "), input("Content: "))
+            send_message(cassandra_session(), input("Sender ID: "), input("Receiver ID: "), input("Content: "),
+                         graph=True)
         elif choice == 18:
             print(recommend_courses(input("Student ID: "), int(input("Limit: "))))
         elif choice == 19:
@@ -124,7 +127,10 @@ def main():
         elif choice == 20:
             reply_to_post(input("Parent Post ID: "), input("Reply ID: "), input("User ID: "), input("Content: "))
         elif choice == 21:
-            add_prerequisite(input("Course ID: "), input("Prereq Course ID: "))
+            try:
+                add_prerequisite(input("Course ID: "), input("Prereq Course ID: "))
+            except ValueError as e:
+                print(e)
         elif choice == 22:
             mark_course_completed(input("Student ID: "), input("Course ID: "))
         elif choice == 23:
@@ -143,13 +149,15 @@ def main():
             set_language_preference(input("User ID: "), input("Language Code: "))
             print("Language preference updated.")
         elif choice == 28:
-            results = search_courses(input("Keyword (leave blank if none): "), input("Category (leave blank if none): "))
+            results = search_courses(input("Keyword (leave blank if none): "), input("Category (leave blank if none): "),
+                                     limit=COURSE_LIST_LIMIT, projection=LIST_VIEW_PROJECTION)
             print(results)
         elif choice == 29:
-            results = browse_courses_by_category(input("Category: "))
+            results = browse_courses_by_category(input("Category: "), limit=COURSE_LIST_LIMIT,
+                                                 projection=LIST_VIEW_PROJECTION)
             print(results)
         elif choice == 30:
-            print(get_course_details(input("Course ID: ")))
+            print(get_course_details_full(input("Course ID: ")))
         elif choice == 31:
             token = create_password_reset(input("Email: "))
             print(f"Password reset token: {token}")
@@ -158,6 +166,7 @@ def main():
             print("Password reset successful." if ok else "Password reset failed.")
         elif choice == 33:
             print("Exiting... Goodbye!")
+            close_all()
             break
         else:
             print("Invalid option. Please try again.")
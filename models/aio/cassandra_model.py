@@ -0,0 +1,255 @@
+from models.cassandra_model import (
+    STATEMENTS, prepared, TUPLE_ROWS, DEFAULT_FETCH_SIZE, TOTAL_LESSONS_TTL, MESSAGE_PAGE_SIZE, INBOX_PAGE_SIZE,
+    MESSAGE_STATEMENTS, INBOX_STATEMENTS, conversation_id,
+    _total_lessons_cache, _counter_deltas, _summary_from_counters, _summary_from_row,
+    QUIZ_ATTEMPT_STATEMENTS, QUIZ_SUMMARY_RETRIES, _current_quiz_summary, _quiz_summary_lost, _quiz_summary_write,
+    _known_conversations, _latest_by_conversation, _log_failure, _message_writes, _month, _previous_month,
+    _split_inbox, _stale_removals, _start_conversation, _timeuuid, _timeuuid_datetime
+)
+from cassandra.cluster import ResultSet
+from datetime import datetime, timedelta
+import asyncio
+import time
+import weakref
+
+# asyncio counterparts of models/cassandra_model.py. Requests go through the
+# driver's execute_async and its ResponseFuture callbacks are bridged onto the
+# running event loop; the statements come from the same per-session registry,
+# each filled on a worker thread by _prepared() the first time it is needed.
+
+def _resolve(future, rows=None, exc=None):
+    if future.done():
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(rows)
+
+def _awaitable(response_future):
+    """
+    Wrap a driver ResponseFuture in an asyncio future resolving to its first page.
+    """
+    loop = asyncio.get_running_loop()
+    result = loop.create_future()
+    response_future.add_callbacks(
+        lambda rows: loop.call_soon_threadsafe(_resolve, result, rows),
+        lambda exc: loop.call_soon_threadsafe(_resolve, result, None, exc))
+    return result
+
+# session -> {statement name -> task preparing it on a worker thread}
+_preparing = weakref.WeakKeyDictionary()
+
+async def _prepared(session, name):
+    """
+    prepared() without blocking the loop: each statement is prepared on a worker
+    thread the first time it is used, and concurrent callers share that attempt.
+    A statement that fails to prepare (e.g. its table does not exist yet) only
+    fails the calls that need it, and is retried on its next use.
+    """
+    tasks = _preparing.setdefault(session, {})
+    task = tasks.get(name)
+    if task is None:
+        task = tasks[name] = asyncio.ensure_future(asyncio.to_thread(prepared, session, name))
+        task.add_done_callback(lambda task: _prepare_done(session, name, task))
+    return await asyncio.shield(task)
+
+def _prepare_done(session, name, task):
+    # Drop a failed attempt even if every caller was cancelled before it failed
+    if task.cancelled() or task.exception() is not None:
+        tasks = _preparing.get(session)
+        if tasks is not None and tasks.get(name) is task:
+            del tasks[name]
+
+async def _prepared_statements(session, *names):
+    return dict(zip(names, await asyncio.gather(*(_prepared(session, name) for name in names))))
+
+async def prepare_session(session):
+    """
+    Optional warm-up: prepare every statement for `session` at startup instead
+    of on first use. Raises if any of them fails; the others stay prepared.
+    """
+    await _prepared_statements(session, *STATEMENTS)
+
+async def _execute(session, name, params, **kwargs):
+    return await _awaitable(session.execute_async(await _prepared(session, name), params, **kwargs))
+
+async def _one(session, name, params):
+    rows = await _execute(session, name, params)
+    return rows[0] if rows else None
+
+async def _stream(session, statement):
+    """
+    Yield every row of a paged query, fetching the next page only once the
+    current one has been consumed.
+    """
+    loop = asyncio.get_running_loop()
+    pages = asyncio.Queue()
+    response_future = session.execute_async(statement)
+    # The driver calls these once per page
+    response_future.add_callbacks(
+        lambda rows: loop.call_soon_threadsafe(pages.put_nowait, (rows, None)),
+        lambda exc: loop.call_soon_threadsafe(pages.put_nowait, (None, exc)))
+    while True:
+        rows, exc = await pages.get()
+        if exc is not None:
+            raise exc
+        for row in rows:
+            yield row
+        if not response_future.has_more_pages:
+            return
+        response_future.start_fetching_next_page()
+
+# --- Day-Bucketed Reads ---
+async def _read_buckets(session, name, user_id, start, end, fetch_size):
+    stmt = await _prepared(session, name)
+    day = end.date()
+    while day >= start.date():
+        bound = stmt.bind((user_id, day, start, end))
+        bound.fetch_size = fetch_size
+        async for row in _stream(session, bound):
+            yield row
+        day -= timedelta(days=1)
+
+# --- Lesson Completion Tracking ---
+async def track_lesson_completion(session, user_id, course_id, lesson_id, score=None):
+    completed_at = datetime.utcnow()
+    row = await _one(session, "track_lesson_completion", (user_id, lesson_id, course_id, completed_at, score))
+    lessons, scored, score_sum = _counter_deltas(row, score)
+    if not row[0]:
+        await _execute(session, "update_lesson_completion", (course_id, completed_at, score, user_id, lesson_id))
+    if lessons or scored or score_sum:
+        await _execute(session, "increment_performance_counters", (lessons, scored, score_sum, user_id, course_id))
+    print(f"Lesson {lesson_id} completed by {user_id}")
+
+# --- Session Logs ---
+async def log_session(session, user_id, login_timestamp, logout_timestamp, session_duration, device_info):
+    await _execute(session, "log_session",
+                   (user_id, login_timestamp.date(), login_timestamp, logout_timestamp, session_duration, device_info))
+
+async def get_session_logs(session, user_id, start, end, fetch_size=DEFAULT_FETCH_SIZE):
+    async for row in _read_buckets(session, "get_session_logs", user_id, start, end, fetch_size):
+        yield row
+
+# --- Quiz Attempts ---
+async def log_quiz_attempt(session, user_id, quiz_id, score, responses):
+    attempted_at = datetime.utcnow()
+    await _execute(session, "log_quiz_attempt", (user_id, quiz_id, attempted_at, score, responses))
+    row = await _one(session, "get_quiz_summary", (user_id, quiz_id))
+    statements = await _prepared_statements(session, *QUIZ_ATTEMPT_STATEMENTS)
+    for _ in range(QUIZ_SUMMARY_RETRIES):
+        stmt, params = _quiz_summary_write(statements, user_id, quiz_id, row, score, attempted_at)
+        result = (await _awaitable(session.execute_async(stmt, params)))[0]
+        if result[0]:
+            return
+        row = _current_quiz_summary(result)
+    _quiz_summary_lost(user_id, quiz_id)
+
+async def get_quiz_summary(session, user_id: str, quiz_id: str):
+    row = await _one(session, "get_quiz_summary", (user_id, quiz_id))
+    return row._asdict() if row else None
+
+async def get_gradebook(session, user_id: str):
+    return [row._asdict() for row in await _execute(session, "get_gradebook", (user_id,))]
+
+# --- Performance Summary ---
+async def update_performance_summary(session, user_id, course_id, average_score, lessons_completed, total_lessons):
+    progress_percent = (lessons_completed / total_lessons) * 100 if total_lessons else 0
+    await _execute(session, "update_performance_summary",
+                   (user_id, course_id, average_score, lessons_completed, total_lessons, progress_percent))
+
+# --- Student Performance Analytics
+async def _total_lessons(course_id):
+    cached = _total_lessons_cache.get(course_id)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    from models.aio.mongo_model import count_course_lessons
+    total = await count_course_lessons(course_id)
+    _total_lessons_cache[course_id] = (total, time.monotonic() + TOTAL_LESSONS_TTL)
+    return total
+
+async def get_performance_summary(session, user_id: str, course_id: str):
+    counters = await _one(session, "get_performance_counters", (user_id, course_id))
+    if counters:
+        return _summary_from_counters(counters, await _total_lessons(course_id))
+
+    row = await _one(session, "get_performance_summary", (user_id, course_id))
+    if row:
+        return _summary_from_row(row)
+    return None
+
+async def get_performance_summaries(session, user_id: str, timeout=None):
+    options = {} if timeout is None else {"timeout": timeout}
+    summary_rows, counter_rows = await asyncio.gather(
+        _execute(session, "get_user_performance_summaries", (user_id,), **options),
+        _execute(session, "get_user_performance_counters", (user_id,), **options))
+    summaries = {row.course_id: _summary_from_row(row) for row in summary_rows}
+    for counters in counter_rows:
+        summaries[counters.course_id] = _summary_from_counters(counters, await _total_lessons(counters.course_id))
+    return summaries
+
+# --- Tracking Student Activity ---
+async def log_user_activity(session, user_id: str, activity_type: str, metadata: dict):
+    now = datetime.utcnow()
+    await _execute(session, "log_user_activity", (user_id, now.date(), now, activity_type, metadata))
+
+async def get_user_activity(session, user_id: str, start: datetime, end: datetime, fetch_size=DEFAULT_FETCH_SIZE):
+    async for row in _read_buckets(session, "get_user_activity", user_id, start, end, fetch_size):
+        yield row
+
+# --- Show Quiz Results
+async def get_quiz_results(session, user_id: str, quiz_id: str, limit: int = 100):
+    return await _execute(session, "get_quiz_results", (user_id, quiz_id, limit), execution_profile=TUPLE_ROWS)
+
+async def get_quiz_results_page(session, user_id: str, quiz_id: str, page_size: int = 20, paging_state=None):
+    bound = (await _prepared(session, "get_quiz_results")).bind((user_id, quiz_id, 2 ** 31 - 1))
+    bound.fetch_size = page_size
+    response_future = session.execute_async(bound, paging_state=paging_state, execution_profile=TUPLE_ROWS)
+    rows = await _awaitable(response_future)
+    return rows, ResultSet(response_future, rows).paging_state
+
+# --- Direct Messages ---
+async def send_message(session, sender_id: str, receiver_id: str, content: str, graph: bool = False):
+    sent_at = _timeuuid()
+    conv = conversation_id(sender_id, receiver_id)
+    statements = await _prepared_statements(session, *MESSAGE_STATEMENTS)
+    if _known_conversations.get(conv) is None:
+        await _awaitable(session.execute_async(*_start_conversation(statements, sender_id, receiver_id, sent_at)))
+        _known_conversations.set(conv, True)
+    pointers = await asyncio.gather(*(_awaitable(session.execute_async(statements["get_inbox_latest"],
+                                                                       (user_id, [conv])))
+                                      for user_id in (sender_id, receiver_id)))
+    latest = {user_id: _latest_by_conversation(rows).get(conv)
+              for user_id, rows in zip((sender_id, receiver_id), pointers)}
+    writes = _message_writes(statements, conv, sender_id, receiver_id, content, sent_at, latest)
+    await asyncio.gather(*(_awaitable(session.execute_async(stmt, params)) for stmt, params in writes))
+    if graph:
+        from models.aio.dgraph_model import message_between_users
+        await message_between_users(sender_id, receiver_id)
+    return sent_at
+
+async def get_conversation_history(session, user_a: str, user_b: str, limit: int = MESSAGE_PAGE_SIZE, before=None):
+    conv = conversation_id(user_a, user_b)
+    row = await _one(session, "get_conversation", (conv,))
+    if not row:
+        return [], None
+    before = before or _timeuuid()
+    month = _month(_timeuuid_datetime(before))
+    messages = []
+    while len(messages) < limit and month >= row.started_month:
+        messages.extend(await _execute(session, "get_messages", (conv, month, before, limit - len(messages))))
+        month = _previous_month(month)
+    if len(messages) < limit:
+        return messages, None
+    return messages, messages[-1].sent_at
+
+async def get_inbox(session, user_id: str, limit: int = INBOX_PAGE_SIZE, before=None):
+    statements = await _prepared_statements(session, *INBOX_STATEMENTS)
+    rows = await _awaitable(session.execute_async(statements["get_inbox"], (user_id, before or _timeuuid(), limit)))
+    if not rows:
+        return [], None
+    latest = _latest_by_conversation(await _awaitable(session.execute_async(
+        statements["get_inbox_latest"], (user_id, [row.conversation_id for row in rows]))))
+    page, stale = _split_inbox(rows, latest)
+    for stmt, params in _stale_removals(statements, user_id, stale, latest):
+        session.execute_async(stmt, params).add_errback(_log_failure)
+    return page, rows[-1].last_message_at if len(rows) == limit else None
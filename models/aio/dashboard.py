@@ -0,0 +1,73 @@
+from db.connections import cassandra_session
+from models.aio.mongo_model import get_user_profile
+from models.aio.cassandra_model import get_performance_summaries
+from models.aio.dgraph_model import get_student_courses
+from models.dashboard import DEFAULT_TIMEOUTS
+import asyncio
+import time
+
+# asyncio counterpart of models/dashboard.py: the three stores are awaited
+# concurrently on the running loop instead of on a thread pool.
+
+_connecting = None
+
+async def _cassandra_session():
+    """
+    cassandra_session() on a worker thread, so the first connect (or a failing
+    one, which is not cached) counts against the Cassandra timeout instead of
+    blocking the loop. Concurrent callers share one attempt.
+    """
+    global _connecting
+    if _connecting is None:
+        _connecting = asyncio.ensure_future(asyncio.to_thread(cassandra_session))
+        _connecting.add_done_callback(_connected)
+    return await asyncio.shield(_connecting)
+
+def _connected(task):
+    global _connecting
+    # A failed attempt is dropped so the next dashboard retries, even if every
+    # caller had already timed out and none saw the error
+    if task.cancelled() or task.exception() is not None:
+        if _connecting is task:
+            _connecting = None
+
+async def _performance(user_id, timeout):
+    start = time.perf_counter()
+    session = await _cassandra_session()
+    return await get_performance_summaries(session, user_id, timeout=timeout - (time.perf_counter() - start))
+
+# store -> (dashboard section, loader(user_id, timeout)); the timeout is also
+# passed to the driver so an abandoned query does not keep running server-side
+SECTIONS = {
+    "mongo": ("profile", lambda user_id, timeout: get_user_profile(user_id, timeout=timeout)),
+    "cassandra": ("performance", _performance),
+    "dgraph": ("courses", lambda user_id, timeout: get_student_courses(user_id, timeout=timeout)),
+}
+
+
+async def _timed(load, user_id, timeout):
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(load(user_id, timeout), timeout), None, time.perf_counter() - start
+    except asyncio.TimeoutError:
+        return None, f"timed out after {timeout}s", time.perf_counter() - start
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", time.perf_counter() - start
+
+
+async def get_student_dashboard(user_id: str, timeouts: dict = None):
+    timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+    start = time.perf_counter()
+    results = await asyncio.gather(*(_timed(load, user_id, timeouts[store])
+                                     for store, (_, load) in SECTIONS.items()))
+
+    dashboard = {"user_id": user_id, "timings_ms": {}, "errors": {}}
+    for (store, (section, _)), (value, error, elapsed) in zip(SECTIONS.items(), results):
+        dashboard[section] = value
+        if error:
+            dashboard["errors"][store] = error
+        dashboard["timings_ms"][store] = round(elapsed * 1000, 1)
+
+    dashboard["timings_ms"]["total"] = round((time.perf_counter() - start) * 1000, 1)
+    dashboard["partial"] = bool(dashboard["errors"])
+    return dashboard
@@ -0,0 +1,119 @@
+from db.connections import async_mongo_db
+from db.dgraph_client import get_async_dgraph_client
+from models.course_similarity import merge_neighbors
+from models.aio.prerequisites import check_new_prerequisite, invalidate_prerequisite_graph, missing_prerequisites
+from models.dgraph_model import (
+    FORUM_PAGE_SIZE, RECENT_POSTS_QUERY, RECOMMEND_QUERY, RECOMMEND_TIMEOUT, STUDENT_COURSES_QUERY, THREAD_DEPTH,
+    THREAD_QUERY, _page, _post_request, _recent_posts_variables, _recommend_variables, _reply_request,
+    _student_courses, _thread, _thread_variables, _upsert_request
+)
+import json
+
+# asyncio counterparts of models/dgraph_model.py on pydgraph's grpc.aio client.
+# Same names, arguments and mutations; only the transport differs.
+
+async def _upsert_edge(client, source, edge, target):
+    txn = client.txn()
+    return await txn.do_request(_upsert_request(txn, source, edge, target))
+
+# --- Enroll Student ---
+async def enroll_student(student_id, course_id, client=None, check_prerequisites=False):
+    client = client or get_async_dgraph_client()
+    if check_prerequisites:
+        missing = await missing_prerequisites(student_id, course_id, client)
+        if missing:
+            print(f"{student_id} cannot enroll in {course_id}; missing prerequisites: {', '.join(missing)}")
+            return False
+    response = await _upsert_edge(client, ("Student", "student_id", student_id), "enrolled",
+                                  ("Course", "course_id", course_id))
+    print(f"{student_id} enrolled in {course_id}")
+    print("Generated UIDs:", response.uids)
+    return True
+
+# --- Create Instructor Teaching Relationship ---
+async def instructor_teaches(instructor_id, course_id, client=None):
+    client = client or get_async_dgraph_client()
+    await _upsert_edge(client, ("Instructor", "instructor_id", instructor_id), "teaches",
+                       ("Course", "course_id", course_id))
+    print(f"{instructor_id} now teaches {course_id}")
+
+# --- Submit Assignment ---
+async def submit_assignment(student_id, assignment_id, score, client=None):
+    client = client or get_async_dgraph_client()
+    response = await _upsert_edge(client, ("Student", "student_id", student_id), "submitted",
+                                  ("Assignment", "assignment_id", assignment_id, {"score": score}))
+    print(f"{student_id} submitted {assignment_id}")
+    print("Generated UIDs:", response.uids)
+
+# --- Student Follows Instructor ---
+async def student_follows_instructor(student_id, instructor_id, client=None):
+    client = client or get_async_dgraph_client()
+    response = await _upsert_edge(client, ("Student", "student_id", student_id), "follows",
+                                  ("Instructor", "instructor_id", instructor_id))
+    print(f"{student_id} now follows {instructor_id}")
+    print("Generated UIDs:", response.uids)
+
+# --- Message Between Users ---
+async def message_between_users(sender_id, receiver_id, client=None):
+    client = client or get_async_dgraph_client()
+    await _upsert_edge(client, ("User", "user_id", sender_id), "messaged", ("User", "user_id", receiver_id))
+    print(f"{sender_id} messaged {receiver_id}")
+
+# --- Personalized Course Recommendations ---
+async def recommend_courses(student_id: str, limit: int = 5, client=None, offset: int = 0,
+                            timeout=RECOMMEND_TIMEOUT, precomputed: bool = False):
+    client = client or get_async_dgraph_client()
+    if precomputed:
+        courses = await get_student_courses(student_id, client)
+        course_ids = courses["enrolled"] + courses["completed"]
+        docs = await async_mongo_db().course_similarities.find({"_id": {"$in": course_ids}},
+                                                               {"neighbors": 1}).to_list(None)
+        return merge_neighbors(docs, set(course_ids), limit, offset)
+    res = await client.txn(read_only=True).query(RECOMMEND_QUERY,
+                                                 variables=_recommend_variables(student_id, limit, offset),
+                                                 timeout=timeout)
+    return json.loads(res.json).get("recommendations", [])
+
+# --- Student Courses ---
+async def get_student_courses(student_id: str, client=None, timeout=None):
+    client = client or get_async_dgraph_client()
+    res = await client.txn(read_only=True).query(STUDENT_COURSES_QUERY, variables={"$sid": student_id},
+                                                 timeout=timeout)
+    return _student_courses(json.loads(res.json))
+
+# --- Discussion Forum & Social Interactions ---
+async def create_forum_post(post_id: str, user_id: str, content: str, client=None):
+    client = client or get_async_dgraph_client()
+    txn = client.txn()
+    await txn.do_request(_post_request(txn, post_id, user_id, content))
+
+async def reply_to_post(parent_id: str, reply_id: str, user_id: str, content: str, client=None):
+    client = client or get_async_dgraph_client()
+    txn = client.txn()
+    await txn.do_request(_reply_request(txn, parent_id, reply_id, user_id, content))
+
+async def get_thread(post_id: str, depth: int = THREAD_DEPTH, first: int = FORUM_PAGE_SIZE, after: str = None,
+                     client=None):
+    client = client or get_async_dgraph_client()
+    res = await client.txn(read_only=True).query(THREAD_QUERY,
+                                                 variables=_thread_variables(post_id, depth, first, after))
+    return _thread(json.loads(res.json), depth, first, after)
+
+async def list_recent_posts(first: int = FORUM_PAGE_SIZE, before: str = None, client=None):
+    client = client or get_async_dgraph_client()
+    res = await client.txn(read_only=True).query(RECENT_POSTS_QUERY, variables=_recent_posts_variables(first, before))
+    return _page(json.loads(res.json).get("posts", []), first, before)
+
+# --- Course Prerequisites ---
+async def add_prerequisite(course_id: str, prereq_id: str, client=None):
+    client = client or get_async_dgraph_client()
+    await check_new_prerequisite(course_id, prereq_id, client)
+    await _upsert_edge(client, ("Course", "course_id", course_id), "prerequisite",
+                       ("Course", "course_id", prereq_id))
+    invalidate_prerequisite_graph()
+
+# --- Course Completion Link ---
+async def mark_course_completed(student_id: str, course_id: str, client=None):
+    client = client or get_async_dgraph_client()
+    await _upsert_edge(client, ("Student", "student_id", student_id), "completed",
+                       ("Course", "course_id", course_id))
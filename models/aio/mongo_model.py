@@ -0,0 +1,324 @@
+from db.connections import LazyConnection, async_mongo_db
+from models.mongo_model import (
+    LIST_VIEW_PROJECTION, SESSION_PROJECTION, USER_PROFILE_PROJECTION, course_cache, session_cache, invalidate_course_cache,
+    _session_expired, _session_touch, _new_session_fields, _token_hash,
+    _check_rating, _rating_deltas, _rating_stats_update, _rating_rebuild_pipeline, _rating_stats,
+    _top_rated_cache_key, _top_rated_filter, _cacheable, _max_time_ms,
+    _course_pipeline, _course_detail_pipeline, _next_cursor, _search_cache_key, _category_cache_key, _lesson_count_pipeline
+)
+from models.passwords import get_password_hasher
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from datetime import datetime, timedelta
+import copy
+import secrets
+
+# asyncio counterparts of models/mongo_model.py on Motor. Same names, arguments and
+# return values; course reads and session checks share the sync module's caches and
+# password hashing goes through the shared process pool.
+
+db = LazyConnection(async_mongo_db)
+
+async def _cached(key, tags, load):
+    missing = object()
+    value = course_cache.get(key, missing)
+    if value is missing:
+        value = await load()
+        if value is not None:
+            course_cache.set(key, value, tags)
+    return copy.deepcopy(value)
+
+# --- Users ---
+async def login_user(email: str, password: str, ip_address: str, device_info: str):
+    hasher = get_password_hasher()
+    user = await db.users.find_one({"email": email})
+    if not user or not await hasher.verify_async(password, user["hashed_password"]):
+        return None
+    if hasher.needs_rehash(user["hashed_password"]):
+        await db.users.update_one({"_id": user["_id"], "hashed_password": user["hashed_password"]},
+                                  {"$set": {"hashed_password": await hasher.hash_async(password)}})
+    now = datetime.utcnow()
+    session = {
+        "user_id": user["_id"],
+        "login_timestamp": now,
+        "ip_address": ip_address,
+        "device_info": device_info,
+        "active": True,
+        **_new_session_fields(now)
+    }
+    result = await db.sessions.insert_one(session)
+    session_id = str(result.inserted_id)
+    session_cache.set(session_id, {k: session[k] for k in SESSION_PROJECTION if k in session})
+    return session_id
+
+async def find_user_by_email(email):
+    return await db.users.find_one({"email": email})
+
+async def get_user_profile(user_id: str, timeout=None):
+    if not ObjectId.is_valid(user_id):
+        return None
+    return await db.users.find_one({"_id": ObjectId(user_id)}, USER_PROFILE_PROJECTION,
+                                   max_time_ms=_max_time_ms(timeout))
+
+async def register_user(username, email, password, role):
+    if await db.users.find_one({"$or": [{"username": username}, {"email": email}]}):
+        print("User already exists.")
+        return
+
+    hashed_pw = await get_password_hasher().hash_async(password)
+
+    user = {
+        "username": username,
+        "email": email,
+        "hashed_password": hashed_pw,
+        "role": role,
+        "language_preference": "en",
+        "bookmarks": [],
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+
+    result = await db.users.insert_one(user)
+    print(f"User {username} registered with ID: {result.inserted_id}")
+
+async def update_user_profile(user_id, name=None, bio=None, photo=None):
+    update = {"updated_at": datetime.utcnow()}
+    if name: update["profile.name"] = name
+    if bio: update["profile.bio"] = bio
+    if photo: update["profile.photo"] = photo
+    await db.users.update_one({"_id": ObjectId(user_id)}, {"$set": update})
+
+# --- Courses ---
+async def create_course(instructor_id, title, description, category, tags):
+    course = {
+        "instructor_id": ObjectId(instructor_id),
+        "title": title,
+        "description": description,
+        "lesson_ids": [],
+        "category": category,
+        "tags": tags,
+        "rating_count": 0,
+        "rating_sum": 0,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+    result = await db.courses.insert_one(course)
+    invalidate_course_cache(category=category)
+    print(f"Course '{title}' created with ID: {result.inserted_id}")
+
+async def add_lesson_to_course(course_id, lesson_id):
+    course = await db.courses.find_one_and_update({"_id": ObjectId(course_id)},
+                                                  {"$push": {"lesson_ids": ObjectId(lesson_id)}},
+                                                  projection={"category": 1})
+    invalidate_course_cache(course_id, course and course.get("category"))
+
+async def count_course_lessons(course_id):
+    if not ObjectId.is_valid(course_id):
+        return None
+    result = await db.courses.aggregate(_lesson_count_pipeline(course_id)).to_list(1)
+    return result[0]["total"] if result else None
+
+# --- Lessons ---
+async def create_lesson(course_id, title, content, content_type, resource_urls):
+    lesson = {
+        "course_id": ObjectId(course_id),
+        "title": title,
+        "content": content,
+        "content_type": content_type,
+        "resource_urls": resource_urls,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+    result = await db.lessons.insert_one(lesson)
+    print(f"Lesson '{title}' created with ID: {result.inserted_id}")
+
+# --- Quizzes ---
+async def create_quiz(course_id, questions):
+    quiz = {
+        "course_id": ObjectId(course_id),
+        "questions": questions,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+    result = await db.quizzes.insert_one(quiz)
+    course_cache.invalidate_tag(f"course:{course_id}")
+    print(f"Quiz created with ID: {result.inserted_id}")
+
+# --- Certificates ---
+async def create_certificate(user_id, course_id, certificate_link):
+    cert = {
+        "user_id": ObjectId(user_id),
+        "course_id": ObjectId(course_id),
+        "completion_date": datetime.utcnow(),
+        "certificate_link": certificate_link
+    }
+    result = await db.certificates.insert_one(cert)
+    print(f"Certificate created with ID: {result.inserted_id}")
+
+# --- Bookmarking Courses ---
+async def add_bookmark(user_id: str, course_id: str):
+    await db.users.update_one(
+        {"_id": ObjectId(user_id)},
+        {"$addToSet": {"bookmarks": ObjectId(course_id)}}
+    )
+
+async def remove_bookmark(user_id: str, course_id: str):
+    await db.users.update_one(
+        {"_id": ObjectId(user_id)},
+        {"$pull": {"bookmarks": ObjectId(course_id)}}
+    )
+
+# --- Multi-language Support ---
+async def set_language_preference(user_id: str, lang_code: str):
+    await db.users.update_one(
+        {"_id": ObjectId(user_id)},
+        {"$set": {"language_preference": lang_code, "updated_at": datetime.utcnow()}}
+    )
+
+# --- Password Recovery ---
+async def create_password_reset(email: str):
+    user = await db.users.find_one({"email": email})
+    if not user:
+        return None
+    token = secrets.token_urlsafe(32)
+    await db.password_resets.insert_one({
+        "user_id": user["_id"],
+        "token_hash": _token_hash(token),
+        "created_at": datetime.utcnow(),
+        "expires_at": datetime.utcnow() + timedelta(hours=1)
+    })
+    return token
+
+async def reset_password(token: str, new_password: str):
+    pr = await db.password_resets.find_one_and_delete(
+        {"token_hash": _token_hash(token), "expires_at": {"$gt": datetime.utcnow()}},
+        projection={"user_id": 1}
+    )
+    if not pr:
+        return False
+    hashed = await get_password_hasher().hash_async(new_password)
+    await db.users.update_one({"_id": pr["user_id"]}, {"$set": {"hashed_password": hashed}})
+    return True
+
+# --- Search Courses by Title or Category ---
+def _course_query(keyword=None, category=None, limit=None, cursor=None, projection=None, batch_size=None):
+    pipeline = _course_pipeline(keyword, category, limit, cursor, projection)
+    return db.courses.aggregate(pipeline, batchSize=batch_size) if batch_size else db.courses.aggregate(pipeline)
+
+async def _course_page(keyword, category, limit, cursor, projection):
+    docs = await _course_query(keyword, category, limit, cursor, projection).to_list(limit)
+    return docs, _next_cursor(docs, keyword, category, limit)
+
+async def search_courses(keyword: str = None, category: str = None, limit: int = None, projection: dict = None):
+    load = lambda: _course_query(keyword, category, limit, projection=projection).to_list(None)
+    if not _cacheable(limit, projection):
+        return await load()
+    key, tags = _search_cache_key(keyword, category, limit, projection)
+    return await _cached(key, tags, load)
+
+async def search_courses_page(keyword: str = None, category: str = None, limit: int = 20, cursor: str = None,
+                              projection: dict = LIST_VIEW_PROJECTION):
+    return await _course_page(keyword, category, limit, cursor, projection)
+
+async def iter_search_courses(keyword: str = None, category: str = None, projection: dict = LIST_VIEW_PROJECTION,
+                              batch_size: int = 100):
+    async for course in _course_query(keyword, category, projection=projection, batch_size=batch_size):
+        yield course
+
+# --- Course Category Browsing ---
+async def browse_courses_by_category(category: str, limit: int = None, projection: dict = None):
+    load = lambda: _course_query(category=category, limit=limit, projection=projection).to_list(None)
+    if not _cacheable(limit, projection):
+        return await load()
+    key, tags = _category_cache_key(category, limit, projection)
+    return await _cached(key, tags, load)
+
+async def browse_courses_page(category: str, limit: int = 20, cursor: str = None,
+                              projection: dict = LIST_VIEW_PROJECTION):
+    return await _course_page(None, category, limit, cursor, projection)
+
+async def iter_courses_by_category(category: str, projection: dict = LIST_VIEW_PROJECTION, batch_size: int = 100):
+    async for course in _course_query(category=category, projection=projection, batch_size=batch_size):
+        yield course
+
+# --- Course Ratings ---
+async def rate_course(user_id: str, course_id: str, rating: int):
+    _check_rating(rating)
+    now = datetime.utcnow()
+    previous = await db.course_ratings.find_one_and_update(
+        {"course_id": ObjectId(course_id), "user_id": ObjectId(user_id)},
+        {"$set": {"rating": rating, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+        projection={"rating": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    count, total, histogram = _rating_deltas(previous and previous["rating"], rating)
+    if not (count or total or histogram):
+        return
+    course = await db.courses.find_one_and_update({"_id": ObjectId(course_id)},
+                                                  _rating_stats_update(count, total, histogram),
+                                                  projection={"category": 1})
+    invalidate_course_cache(course_id, course and course.get("category"))
+
+async def rebuild_course_rating_stats(course_id: str):
+    groups = await db.course_ratings.aggregate(_rating_rebuild_pipeline(course_id)).to_list(None)
+    stats = _rating_stats(groups)
+    course = await db.courses.find_one_and_update({"_id": ObjectId(course_id)}, {"$set": stats},
+                                                  projection={"category": 1})
+    invalidate_course_cache(course_id, course and course.get("category"))
+    return stats
+
+async def top_rated_courses(category: str, limit: int = 10, min_ratings: int = 1,
+                            projection: dict = LIST_VIEW_PROJECTION):
+    load = lambda: (db.courses.find(_top_rated_filter(category, min_ratings), projection)
+                    .sort([("average_rating", -1), ("_id", 1)]).limit(limit).to_list(None))
+    if not _cacheable(limit, projection):
+        return await load()
+    key, tags = _top_rated_cache_key(category, limit, min_ratings, projection)
+    return await _cached(key, tags, load)
+
+# --- Session Validation ---
+async def validate_session(session_id: str):
+    if not ObjectId.is_valid(session_id):
+        return None
+    missing = object()
+    session = session_cache.get(session_id, missing)
+    if session is missing:
+        session = await db.sessions.find_one({"_id": ObjectId(session_id), "active": True}, SESSION_PROJECTION)
+        if session is not None:
+            session_cache.set(session_id, session)
+    now = datetime.utcnow()
+    if session is None or _session_expired(session, now):
+        session_cache.invalidate(session_id)
+        return None
+    touch = _session_touch(session, now)
+    if touch:
+        result = await db.sessions.update_one({"_id": ObjectId(session_id), "active": True}, {"$set": touch})
+        if not result.matched_count:
+            session_cache.invalidate(session_id)
+            return None
+        session_cache.set(session_id, {**session, **touch})
+    return session["user_id"]
+
+# --- Logout ---
+async def logout_user(session_id: str):
+    await db.sessions.update_one(
+        {"_id": ObjectId(session_id)},
+        {"$set": {"active": False, "expires_at": datetime.utcnow()}}
+    )
+    session_cache.invalidate(session_id)
+
+# --- View Course Details
+async def get_course_details(course_id: str):
+    return await _cached(("course", course_id), [f"course:{course_id}"],
+                         lambda: db.courses.find_one({"_id": ObjectId(course_id)}))
+
+async def _first(cursor):
+    docs = await cursor.to_list(1)
+    return docs[0] if docs else None
+
+async def get_course_details_full(course_id: str):
+    if not ObjectId.is_valid(course_id):
+        return None
+    return await _cached(("course_full", course_id), [f"course:{course_id}"],
+                         lambda: _first(db.courses.aggregate(_course_detail_pipeline(course_id))))
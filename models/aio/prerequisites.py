@@ -0,0 +1,43 @@
+from db.dgraph_client import get_async_dgraph_client
+from models.prerequisites import (
+    PREREQUISITE_PAGE_SIZE, PREREQUISITES_QUERY, PrerequisiteGraph, _prerequisite_map,
+    cached_graph, cache_graph, invalidate_prerequisite_graph
+)
+import json
+
+# asyncio counterparts of models/prerequisites.py; the graph cache is shared with
+# the sync module.
+
+async def load_prerequisite_graph(client=None, page_size=PREREQUISITE_PAGE_SIZE):
+    client = client or get_async_dgraph_client()
+    pages, after = [], "0x0"
+    while True:
+        variables = {"$first": str(page_size), "$after": after}
+        res = await client.txn(read_only=True).query(PREREQUISITES_QUERY, variables=variables)
+        courses = json.loads(res.json)["courses"]
+        pages.append(courses)
+        if len(courses) < page_size:
+            break
+        after = courses[-1]["uid"]
+    return PrerequisiteGraph(_prerequisite_map(pages))
+
+async def get_prerequisite_graph(client=None):
+    return cached_graph() or cache_graph(await load_prerequisite_graph(client))
+
+async def check_new_prerequisite(course_id, prereq_id, client=None):
+    if (await get_prerequisite_graph(client)).would_create_cycle(course_id, prereq_id):
+        raise ValueError(f"{prereq_id} cannot be a prerequisite of {course_id}: "
+                         f"{course_id} is already required for {prereq_id}")
+
+async def missing_prerequisites(student_id, course_id, client=None):
+    from models.aio.dgraph_model import get_student_courses
+    completed = (await get_student_courses(student_id, client))["completed"]
+    return (await get_prerequisite_graph(client)).missing(course_id, completed)
+
+async def can_enroll(student_id, course_id, client=None):
+    return not await missing_prerequisites(student_id, course_id, client)
+
+async def plan_learning_path(student_id, course_id, client=None):
+    from models.aio.dgraph_model import get_student_courses
+    completed = (await get_student_courses(student_id, client))["completed"]
+    return (await get_prerequisite_graph(client)).learning_path(course_id, completed)
@@ -0,0 +1,17 @@
+import csv
+import json
+
+# Input readers shared by the bulk loaders (cassandra_bulk, mongo_bulk).
+
+
+def read_rows(path):
+    """
+    Stream rows from a .csv (header row required) or .jsonl file as dicts.
+    """
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,207 @@
+from db.cassandra_client import get_cassandra_session
+from models.bulk_io import read_rows
+from models.cassandra_model import prepared, rebuild_performance_counters, rebuild_quiz_summaries
+from cassandra.concurrent import execute_concurrent
+from cassandra.query import BatchStatement, BatchType
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+import argparse
+import json
+import os
+import time
+
+# Backfill loader for the telemetry tables. Rows are streamed from CSV or JSONL,
+# grouped by partition key into UNLOGGED batches (one partition per batch, so the
+# coordinator never fans a batch out) and executed concurrently.
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_CONCURRENCY = 64
+DEFAULT_WINDOW = 20000
+DEFAULT_MAX_RETRIES = 3
+
+
+def _timestamp(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+def _optional_float(value):
+    return None if value in (None, "") else float(value)
+
+def _convert(converter, value):
+    # CSV cells are "" when empty; that is a missing value, not something to parse
+    if value is None or (converter and value == ""):
+        return None
+    return converter(value) if converter else value
+
+def _text_map(value):
+    if isinstance(value, str):
+        value = json.loads(value) if value else {}
+    return {str(k): str(v) for k, v in value.items()}
+
+
+# table -> (statement name in cassandra_model.STATEMENTS, columns in bind order,
+#           converters, partition key columns, derived columns)
+TABLES = {
+    "lesson_completion": (
+        "load_lesson_completion",
+        ["user_id", "lesson_id", "course_id", "completion_timestamp", "quiz_score"],
+        {"completion_timestamp": _timestamp, "quiz_score": _optional_float},
+        ["user_id"],
+        {},
+    ),
+    "quiz_attempts_by_quiz": (
+        "log_quiz_attempt",
+        ["user_id", "quiz_id", "attempt_timestamp", "score", "responses"],
+        {"attempt_timestamp": _timestamp, "score": float, "responses": _text_map},
+        ["user_id"],
+        {},
+    ),
+    "user_activity_by_day": (
+        "log_user_activity",
+        ["user_id", "day", "timestamp", "activity_type", "metadata"],
+        {"timestamp": _timestamp, "metadata": _text_map},
+        ["user_id", "day"],
+        {"day": lambda row: _timestamp(row["timestamp"]).date()},
+    ),
+    "session_logs_by_day": (
+        "log_session",
+        ["user_id", "day", "login_timestamp", "logout_timestamp", "session_duration", "device_info"],
+        {"login_timestamp": _timestamp, "logout_timestamp": _timestamp, "session_duration": int},
+        ["user_id", "day"],
+        {"day": lambda row: _timestamp(row["login_timestamp"]).date()},
+    ),
+}
+
+# Summary tables derived from a telemetry table. They are rebuilt once per loaded
+# user after the last window, not per window: a rebuild re-reads the user's whole
+# partition. The users still to rebuild are kept next to the checkpoint so a
+# resumed load covers the windows written before it stopped.
+#
+# A rebuild reads the counters and then increments them by the difference, so
+# live track_lesson_completion traffic for the same users during the load can
+# make the counters drift; run rebuild_performance_counters again afterwards.
+REBUILD_SUMMARIES = {
+    "lesson_completion": rebuild_performance_counters,
+    "quiz_attempts_by_quiz": rebuild_quiz_summaries,
+}
+
+
+def _read_checkpoint(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    return 0
+
+def _write_checkpoint(path, rows_done):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(str(rows_done))
+    os.replace(tmp, path)
+
+
+def _add_pending_users(path, user_ids):
+    with open(path, "a") as f:
+        f.writelines(f"{user_id}\n" for user_id in user_ids)
+
+def _read_pending_users(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+def _rebuild(session, rebuild, user_ids, concurrency):
+    # Each rebuild is a handful of sequential single-partition requests, so
+    # run `concurrency` of them at a time
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in pool.map(lambda user_id: rebuild(session, user_id), user_ids):
+            pass
+
+
+def _batches(session, table, rows, batch_size):
+    """
+    Group a window of rows by partition key and yield one UNLOGGED batch per
+    `batch_size` rows of the same partition.
+    """
+    statement_name, columns, converters, partition_key, derived = TABLES[table]
+    stmt = prepared(session, statement_name)
+    partitions = defaultdict(list)
+    for row in rows:
+        row = dict(row, **{column: derive(row) for column, derive in derived.items()})
+        values = tuple(_convert(converters.get(c), row.get(c)) for c in columns)
+        partitions[tuple(row[c] for c in partition_key)].append(values)
+
+    for values_list in partitions.values():
+        for i in range(0, len(values_list), batch_size):
+            batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+            for values in values_list[i:i + batch_size]:
+                batch.add(stmt, values)
+            yield batch
+
+
+def _execute(session, batches, concurrency, max_retries):
+    for attempt in range(max_retries + 1):
+        results = execute_concurrent(session, [(batch, None) for batch in batches],
+                                     concurrency=concurrency, raise_on_first_error=False)
+        failed = [(batch, result) for batch, (ok, result) in zip(batches, results) if not ok]
+        if not failed:
+            return
+        batches = [batch for batch, _ in failed]
+    raise RuntimeError(f"{len(failed)} batches failed after {max_retries} retries: {failed[0][1]}")
+
+
+def bulk_load(session, table, path, batch_size=DEFAULT_BATCH_SIZE, concurrency=DEFAULT_CONCURRENCY,
+              window=DEFAULT_WINDOW, max_retries=DEFAULT_MAX_RETRIES, checkpoint_path=None):
+    """
+    Load `path` into `table`, `window` rows at a time. After each window is fully
+    written the number of rows consumed is saved to `checkpoint_path`
+    (default: <path>.<table>.checkpoint), so a re-run resumes where it stopped.
+    Derived summaries are rebuilt for every loaded user once all windows are in.
+    """
+    checkpoint_path = checkpoint_path or f"{path}.{table}.checkpoint"
+    pending_path = f"{checkpoint_path}.rebuild"
+    rebuild = REBUILD_SUMMARIES.get(table)
+    pending = _read_pending_users(pending_path)
+    rows_done = _read_checkpoint(checkpoint_path)
+    rows = islice(read_rows(path), rows_done, None)
+    if rows_done:
+        print(f"Resuming {table} from row {rows_done}")
+
+    start = time.perf_counter()
+    loaded = 0
+    while True:
+        chunk = list(islice(rows, window))
+        if not chunk:
+            break
+        _execute(session, list(_batches(session, table, chunk, batch_size)), concurrency, max_retries)
+        if rebuild:
+            new_users = {str(row["user_id"]) for row in chunk} - pending
+            _add_pending_users(pending_path, new_users)
+            pending |= new_users
+        loaded += len(chunk)
+        rows_done += len(chunk)
+        _write_checkpoint(checkpoint_path, rows_done)
+        elapsed = time.perf_counter() - start
+        print(f"[{table}] {rows_done} rows ({loaded / elapsed:.0f} rows/sec)")
+
+    if rebuild and pending:
+        print(f"[{table}] rebuilding summaries for {len(pending)} users")
+        _rebuild(session, rebuild, sorted(pending), concurrency)
+        os.remove(pending_path)
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {table}: loaded {loaded} rows in {elapsed:.1f}s")
+    return {"rows": loaded, "seconds": elapsed, "rows_per_sec": loaded / elapsed if elapsed else 0.0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load telemetry rows into Cassandra.")
+    parser.add_argument("table", choices=sorted(TABLES))
+    parser.add_argument("path", help="CSV or JSONL file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW)
+    parser.add_argument("--checkpoint")
+    args = parser.parse_args()
+    bulk_load(get_cassandra_session(), args.table, args.path, batch_size=args.batch_size,
+              concurrency=args.concurrency, window=args.window, checkpoint_path=args.checkpoint)
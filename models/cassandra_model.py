@@ -1,5 +1,14 @@
-from datetime import datetime
-from cassandra.query import SimpleStatement
+from models.cache import TTLCache
+from collections import namedtuple
+from datetime import datetime, timedelta
+import logging
+import random
+import threading
+import time
+import uuid
+import weakref
+
+log = logging.getLogger(__name__)
 
 # --- Keyspace and Schema Creation ---
 def create_keyspace(session, keyspace, replication_factor):
@@ -11,96 +20,807 @@ def create_keyspace(session, keyspace, replication_factor):
     WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': {replication_factor}}};
     """)
 
+# user_activity_by_day and session_logs_by_day are partitioned by (user_id, day) so
+# no partition grows without bound; rows expire after 90 and 180 days respectively
+# and TWCS drops whole expired SSTables instead of compacting them. They replace
+# the user_activity and session_logs tables, whose primary keys had no day: a
+# CREATE TABLE IF NOT EXISTS cannot change an existing table's key.
 def create_schema(session):
     """
     Create the necessary tables in the Cassandra keyspace.
     """
     session.execute("""
-    CREATE TABLE IF NOT EXISTS user_activity (
+    CREATE TABLE IF NOT EXISTS user_activity_by_day (
         user_id text,
+        day date,
         timestamp timestamp,
         activity_type text,
         metadata map<text, text>,
-        PRIMARY KEY (user_id, timestamp)
-    ) WITH CLUSTERING ORDER BY (timestamp DESC);
+        PRIMARY KEY ((user_id, day), timestamp)
+    ) WITH CLUSTERING ORDER BY (timestamp DESC)
+      AND default_time_to_live = 7776000
+      AND compaction = {'class': 'TimeWindowCompactionStrategy',
+                        'compaction_window_unit': 'DAYS', 'compaction_window_size': 1};
     """)
 
 
-# --- Lesson Completion Tracking ---
-def track_lesson_completion(session, user_id, course_id, lesson_id, score=None):
-    query = """
+# --- Prepared Statements ---
+# Every CQL statement used by this module. Each one is prepared once per session,
+# on first use, and the prepared statement is reused for every later call.
+STATEMENTS = {
+    "track_lesson_completion": """
     INSERT INTO lesson_completion (user_id, lesson_id, course_id, completion_timestamp, quiz_score)
-    VALUES (%s, %s, %s, %s, %s)
+    VALUES (?, ?, ?, ?, ?)
+    IF NOT EXISTS
+    """,
+    "update_lesson_completion": """
+    UPDATE lesson_completion SET course_id=?, completion_timestamp=?, quiz_score=?
+     WHERE user_id=? AND lesson_id=?
+    """,
+    "load_lesson_completion": """
+    INSERT INTO lesson_completion (user_id, lesson_id, course_id, completion_timestamp, quiz_score)
+    VALUES (?, ?, ?, ?, ?)
+    """,
+    "get_lesson_completions": """
+    SELECT course_id, quiz_score FROM lesson_completion WHERE user_id=?
+    """,
+    "increment_performance_counters": """
+    UPDATE performance_counters
+       SET lessons_completed = lessons_completed + ?,
+           scored_lessons = scored_lessons + ?,
+           score_sum = score_sum + ?
+     WHERE user_id=? AND course_id=?
+    """,
+    "get_performance_counters": """
+    SELECT lessons_completed, scored_lessons, score_sum
+      FROM performance_counters
+     WHERE user_id=? AND course_id=?
+    """,
+    "get_user_performance_counters": """
+    SELECT course_id, lessons_completed, scored_lessons, score_sum
+      FROM performance_counters
+     WHERE user_id=?
+    """,
+    "log_user_activity": """
+    INSERT INTO user_activity_by_day (user_id, day, timestamp, activity_type, metadata)
+    VALUES (?, ?, ?, ?, ?)
+    """,
+    "get_user_activity": """
+    SELECT timestamp, activity_type, metadata
+      FROM user_activity_by_day
+     WHERE user_id=? AND day=? AND timestamp >= ? AND timestamp <= ?
+    """,
+    "log_session": """
+    INSERT INTO session_logs_by_day (user_id, day, login_timestamp, logout_timestamp, session_duration, device_info)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "get_session_logs": """
+    SELECT login_timestamp, logout_timestamp, session_duration, device_info
+      FROM session_logs_by_day
+     WHERE user_id=? AND day=? AND login_timestamp >= ? AND login_timestamp <= ?
+    """,
+    "log_quiz_attempt": """
+    INSERT INTO quiz_attempts_by_quiz (user_id, quiz_id, attempt_timestamp, score, responses)
+    VALUES (?, ?, ?, ?, ?)
+    """,
+    "get_quiz_attempt_scores": """
+    SELECT quiz_id, attempt_timestamp, score FROM quiz_attempts_by_quiz WHERE user_id=?
+    """,
+    "get_quiz_summary": """
+    SELECT latest_score, latest_attempt, best_score, attempt_count
+      FROM quiz_attempt_summary
+     WHERE user_id=? AND quiz_id=?
+    """,
+    "get_gradebook": """
+    SELECT quiz_id, latest_score, latest_attempt, best_score, attempt_count
+      FROM quiz_attempt_summary
+     WHERE user_id=?
+    """,
+    "update_quiz_summary": """
+    INSERT INTO quiz_attempt_summary (user_id, quiz_id, latest_score, latest_attempt, best_score, attempt_count)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "create_quiz_summary": """
+    INSERT INTO quiz_attempt_summary (user_id, quiz_id, latest_score, latest_attempt, best_score, attempt_count)
+    VALUES (?, ?, ?, ?, ?, ?)
+    IF NOT EXISTS
+    """,
+    "advance_quiz_summary": """
+    UPDATE quiz_attempt_summary SET latest_score=?, latest_attempt=?, best_score=?, attempt_count=?
+     WHERE user_id=? AND quiz_id=?
+        IF latest_score=? AND latest_attempt=? AND best_score=? AND attempt_count=?
+    """,
+    "update_performance_summary": """
+    INSERT INTO performance_summary (user_id, course_id, average_score, lessons_completed, total_lessons, progress_percent)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "get_performance_summary": """
+    SELECT average_score, lessons_completed, total_lessons, progress_percent
+      FROM performance_summary
+     WHERE user_id=? AND course_id=?
+    """,
+    "get_user_performance_summaries": """
+    SELECT course_id, average_score, lessons_completed, total_lessons, progress_percent
+      FROM performance_summary
+     WHERE user_id=?
+    """,
+    "send_message": """
+    INSERT INTO messages (conversation_id, month, sent_at, sender_id, receiver_id, content)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "start_conversation": """
+    INSERT INTO conversations (conversation_id, user_a, user_b, started_month)
+    VALUES (?, ?, ?, ?)
+    IF NOT EXISTS
+    """,
+    "get_conversation": """
+    SELECT started_month FROM conversations WHERE conversation_id=?
+    """,
+    "get_messages": """
+    SELECT sent_at, sender_id, receiver_id, content
+      FROM messages
+     WHERE conversation_id=? AND month=? AND sent_at < ?
+     LIMIT ?
+    """,
+    "get_inbox_latest": """
+    SELECT conversation_id, last_message_at FROM inbox_latest WHERE user_id=? AND conversation_id IN ?
+    """,
+    "set_inbox_latest": """
+    INSERT INTO inbox_latest (user_id, conversation_id, last_message_at)
+    VALUES (?, ?, ?)
+    USING TIMESTAMP ?
+    """,
+    "add_inbox_entry": """
+    INSERT INTO inbox_by_time (user_id, last_message_at, conversation_id, other_user_id, last_sender_id, preview)
+    VALUES (?, ?, ?, ?, ?, ?)
+    USING TIMESTAMP ?
+    """,
+    "remove_inbox_entry": """
+    DELETE FROM inbox_by_time USING TIMESTAMP ?
+     WHERE user_id=? AND last_message_at=? AND conversation_id=?
+    """,
+    "get_inbox": """
+    SELECT conversation_id, other_user_id, last_message_at, last_sender_id, preview
+      FROM inbox_by_time
+     WHERE user_id=? AND last_message_at < ?
+     LIMIT ?
+    """,
+    "get_quiz_results": """
+    SELECT attempt_timestamp, score, responses
+      FROM quiz_attempts_by_quiz
+     WHERE user_id=? AND quiz_id=?
+     LIMIT ?
+    """,
+}
+
+# Execution profile registered by db.cassandra_client that returns rows as plain tuples
+TUPLE_ROWS = "tuple_rows"
+
+_QuizSummary = namedtuple("_QuizSummary", "latest_score latest_attempt best_score attempt_count")
+
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+def prepared(session, name):
+    """
+    Return the statement `name` from STATEMENTS prepared for `session`.
+    """
+    with _prepared_lock:
+        statements = _prepared.setdefault(session, {})
+    stmt = statements.get(name)
+    if stmt is None:
+        stmt = statements[name] = session.prepare(STATEMENTS[name])
+    return stmt
+
+def _statements(session, *names):
+    """
+    Resolve several statements up front, e.g. before a chain of execute_async
+    callbacks: prepared() can block on session.prepare(), which must never run
+    on the driver's event-loop thread.
     """
-    session.execute(query, (user_id, lesson_id, course_id, datetime.utcnow(), score))
+    return {name: prepared(session, name) for name in names}
+
+def prepare_all(session):
+    """
+    Eagerly prepare every statement in STATEMENTS for `session`.
+    """
+    for name in STATEMENTS:
+        prepared(session, name)
+
+
+# --- Day-Bucketed Reads ---
+DEFAULT_FETCH_SIZE = 500
+
+def _read_buckets(session, name, user_id, start, end, fetch_size):
+    """
+    Walk the (user_id, day) partitions from `end` back to `start` and stream their
+    rows. Each partition is read with driver paging: only `fetch_size` rows are held
+    at a time and the next page is fetched with the previous page's paging_state.
+    """
+    stmt = prepared(session, name)
+    day = end.date()
+    while day >= start.date():
+        bound = stmt.bind((user_id, day, start, end))
+        bound.fetch_size = fetch_size
+        yield from session.execute(bound)
+        day -= timedelta(days=1)
+
+
+# --- Lesson Completion Tracking ---
+# performance_counters keeps a running count/sum per (user, course) so the summary
+# never has to be recomputed from lesson_completion. Scores are stored in
+# hundredths because counters are integers.
+#
+# Cost: every completion is an IF NOT EXISTS insert, i.e. a Paxos round (four
+# replica round trips instead of one), followed by the counter write. That is
+# what lets a repeat completion be told apart from a first one without a read.
+# A repeat then overwrites the row with a plain UPDATE. Mixing that non-LWT
+# write with LWTs on the same row is safe only because the UPDATE never races
+# a first insert of the same row (it runs after the insert reported the row
+# exists); two concurrent repeats of one lesson by one user can still
+# interleave, leaving the row's score and the counters' score_sum from
+# different attempts until rebuild_performance_counters runs.
+def _hundredths(score):
+    return int(round(score * 100)) if score is not None else 0
+
+def _counter_deltas(row, score):
+    """
+    Counter increments for a completion, given the first row of the conditional
+    insert: a first completion counts once, a repeat only moves the score.
+    """
+    if row[0]:
+        return 1, int(score is not None), _hundredths(score)
+    old = row.quiz_score
+    return 0, int(score is not None) - int(old is not None), _hundredths(score) - _hundredths(old)
+
+COMPLETION_STATEMENTS = ("track_lesson_completion", "update_lesson_completion", "increment_performance_counters")
+
+def _record_completion(statements, row, user_id, course_id, lesson_id, score, completed_at, execute):
+    lessons, scored, score_sum = _counter_deltas(row, score)
+    if not row[0]:
+        execute(statements["update_lesson_completion"], (course_id, completed_at, score, user_id, lesson_id))
+    if lessons or scored or score_sum:
+        return execute(statements["increment_performance_counters"],
+                       (lessons, scored, score_sum, user_id, course_id))
+
+def track_lesson_completion(session, user_id, course_id, lesson_id, score=None):
+    completed_at = datetime.utcnow()
+    statements = _statements(session, *COMPLETION_STATEMENTS)
+    row = session.execute(statements["track_lesson_completion"],
+                          (user_id, lesson_id, course_id, completed_at, score)).one()
+    _record_completion(statements, row, user_id, course_id, lesson_id, score, completed_at, session.execute)
     print(f"Lesson {lesson_id} completed by {user_id}")
 
-# --- User Activity ---
-def log_user_activity(session, user_id, activity_type, metadata):
-    query = """
-    INSERT INTO user_activity (user_id, timestamp, activity_type, metadata)
-    VALUES (%s, toTimestamp(now()), %s, %s)
+def rebuild_performance_counters(session, user_id):
+    """
+    Recompute a user's counters from lesson_completion, e.g. after a bulk backfill
+    that bypassed track_lesson_completion. Counters can only be incremented, so this
+    applies the difference between the stored and the recomputed values.
     """
-    session.execute(query, (user_id, activity_type, metadata))
+    totals = {}
+    for row in session.execute(prepared(session, "get_lesson_completions"), (user_id,)):
+        lessons, scored, score_sum = totals.get(row.course_id, (0, 0, 0))
+        totals[row.course_id] = (lessons + 1, scored + int(row.quiz_score is not None),
+                                 score_sum + _hundredths(row.quiz_score))
+    for course_id, (lessons, scored, score_sum) in totals.items():
+        current = session.execute(prepared(session, "get_performance_counters"), (user_id, course_id)).one()
+        if current:
+            lessons -= current.lessons_completed or 0
+            scored -= current.scored_lessons or 0
+            score_sum -= current.score_sum or 0
+        if lessons or scored or score_sum:
+            session.execute(prepared(session, "increment_performance_counters"),
+                            (lessons, scored, score_sum, user_id, course_id))
 
 # --- Session Logs ---
 def log_session(session, user_id, login_timestamp, logout_timestamp, session_duration, device_info):
-    query = """
-    INSERT INTO session_logs (user_id, login_timestamp, logout_timestamp, session_duration, device_info)
-    VALUES (%s, %s, %s, %s, %s)
+    session.execute(prepared(session, "log_session"),
+                    (user_id, login_timestamp.date(), login_timestamp, logout_timestamp, session_duration, device_info))
+
+def get_session_logs(session, user_id, start, end, fetch_size=DEFAULT_FETCH_SIZE):
     """
-    session.execute(query, (user_id, login_timestamp, logout_timestamp, session_duration, device_info))
+    Yield the user's sessions that started between `start` and `end`, newest first.
+    """
+    yield from _read_buckets(session, "get_session_logs", user_id, start, end, fetch_size)
 
 # --- Quiz Attempts ---
+# Every attempt is kept in quiz_attempts_by_quiz (newest first per quiz within the
+# user's partition). It replaces quiz_attempts, whose (user_id, quiz_id) key kept
+# only the last attempt and cannot be changed in place. quiz_attempt_summary holds
+# one row per (user, quiz) with the latest and best score and the attempt count.
+#
+# Each attempt moves the summary on with a compare-and-set: the write is an LWT
+# conditioned on the whole row it was computed from, so two quick attempts (easy
+# with the fire-and-forget async writes) cannot both build on the same old row and
+# lose an attempt_count or best_score. A failed LWT returns the current values of
+# the condition columns, which is exactly the row to retry from; no extra read is
+# needed. That costs a Paxos round per attempt. rebuild_quiz_summaries still
+# writes plainly and should not run alongside live attempts.
+QUIZ_SUMMARY_RETRIES = 5
+
+def _next_quiz_summary(row, score, attempted_at):
+    if not row:
+        return score, attempted_at, score, 1
+    latest_score, latest_attempt = row.latest_score, row.latest_attempt
+    if latest_attempt is None or attempted_at >= latest_attempt:
+        latest_score, latest_attempt = score, attempted_at
+    best_score = score if row.best_score is None else max(row.best_score, score)
+    return latest_score, latest_attempt, best_score, (row.attempt_count or 0) + 1
+
+QUIZ_ATTEMPT_STATEMENTS = ("log_quiz_attempt", "get_quiz_summary", "create_quiz_summary", "advance_quiz_summary")
+
+def _quiz_summary_write(statements, user_id, quiz_id, row, score, attempted_at):
+    """
+    The conditional write moving the summary from `row` (None if there is no
+    summary yet) to the one including this attempt.
+    """
+    summary = _next_quiz_summary(row, score, attempted_at)
+    if row is None:
+        return statements["create_quiz_summary"], (user_id, quiz_id) + summary
+    return statements["advance_quiz_summary"], summary + (user_id, quiz_id, row.latest_score, row.latest_attempt,
+                                                          row.best_score, row.attempt_count)
+
+def _current_quiz_summary(result):
+    """
+    The row to retry from after a failed summary LWT, from its result row.
+    """
+    return _QuizSummary(result.latest_score, result.latest_attempt, result.best_score, result.attempt_count)
+
+def _quiz_summary_lost(user_id, quiz_id):
+    log.warning("Quiz summary for %s/%s not updated after %d conflicting attempts; "
+                "run rebuild_quiz_summaries", user_id, quiz_id, QUIZ_SUMMARY_RETRIES)
+
 def log_quiz_attempt(session, user_id, quiz_id, score, responses):
-    query = """
-    INSERT INTO quiz_attempts (user_id, quiz_id, attempt_timestamp, score, responses)
-    VALUES (%s, %s, toTimestamp(now()), %s, %s)
+    attempted_at = datetime.utcnow()
+    statements = _statements(session, *QUIZ_ATTEMPT_STATEMENTS)
+    session.execute(statements["log_quiz_attempt"], (user_id, quiz_id, attempted_at, score, responses))
+    row = session.execute(statements["get_quiz_summary"], (user_id, quiz_id)).one()
+    for _ in range(QUIZ_SUMMARY_RETRIES):
+        result = session.execute(*_quiz_summary_write(statements, user_id, quiz_id, row, score, attempted_at)).one()
+        if result[0]:
+            return
+        row = _current_quiz_summary(result)
+    _quiz_summary_lost(user_id, quiz_id)
+
+def rebuild_quiz_summaries(session, user_id):
+    """
+    Recompute a user's quiz_attempt_summary rows from quiz_attempts_by_quiz, e.g.
+    after a bulk backfill that bypassed log_quiz_attempt.
+    """
+    summaries = {}
+    for row in session.execute(prepared(session, "get_quiz_attempt_scores"), (user_id,)):
+        summaries[row.quiz_id] = _next_quiz_summary(_QuizSummary(*summaries[row.quiz_id])
+                                                    if row.quiz_id in summaries else None,
+                                                    row.score, row.attempt_timestamp)
+    for quiz_id, summary in summaries.items():
+        session.execute(prepared(session, "update_quiz_summary"), (user_id, quiz_id) + summary)
+
+def get_quiz_summary(session, user_id: str, quiz_id: str):
+    row = session.execute(prepared(session, "get_quiz_summary"), (user_id, quiz_id)).one()
+    return row._asdict() if row else None
+
+def get_gradebook(session, user_id: str):
+    """
+    Latest score, best score and attempt count for every quiz the user attempted.
     """
-    session.execute(query, (user_id, quiz_id, score, responses))
+    return [row._asdict() for row in session.execute(prepared(session, "get_gradebook"), (user_id,))]
 
 # --- Performance Summary ---
+# Explicit summary row; get_performance_summary only falls back to it for
+# user/course pairs with no completions tracked in performance_counters.
 def update_performance_summary(session, user_id, course_id, average_score, lessons_completed, total_lessons):
     progress_percent = (lessons_completed / total_lessons) * 100 if total_lessons else 0
-    query = """
-    INSERT INTO performance_summary (user_id, course_id, average_score, lessons_completed, total_lessons, progress_percent)
-    VALUES (%s, %s, %s, %s, %s, %s)
-    """
-    session.execute(query, (user_id, course_id, average_score, lessons_completed, total_lessons, progress_percent))
+    session.execute(prepared(session, "update_performance_summary"),
+                    (user_id, course_id, average_score, lessons_completed, total_lessons, progress_percent))
 
 # --- Student Performance Analytics
-def get_performance_summary(session, user_id: str, course_id: str):
-    cql = """
-    SELECT average_score, lessons_completed, total_lessons, progress_percent
-      FROM performance_summary
-     WHERE user_id=%s AND course_id=%s;
+TOTAL_LESSONS_TTL = 300
+_total_lessons_cache = {}
+
+def _total_lessons(course_id):
     """
-    stmt = session.prepare(cql)
-    row = session.execute(stmt, (user_id, course_id)).one()
+    Number of lessons in a course, from the course's lesson_ids in MongoDB.
+    Cached for TOTAL_LESSONS_TTL seconds since it is read on every summary.
+    """
+    cached = _total_lessons_cache.get(course_id)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    from models.mongo_model import count_course_lessons
+    total = count_course_lessons(course_id)
+    _total_lessons_cache[course_id] = (total, time.monotonic() + TOTAL_LESSONS_TTL)
+    return total
+
+def _summary_from_counters(counters, total_lessons):
+    lessons_completed = counters.lessons_completed or 0
+    scored = counters.scored_lessons or 0
+    return {
+        "average_score": (counters.score_sum or 0) / 100 / scored if scored else None,
+        "lessons_completed": lessons_completed,
+        "total_lessons": total_lessons,
+        "progress_percent": (lessons_completed / total_lessons) * 100 if total_lessons else 0
+    }
+
+def _summary_from_row(row):
+    return {
+        "average_score": row.average_score,
+        "lessons_completed": row.lessons_completed,
+        "total_lessons": row.total_lessons,
+        "progress_percent": row.progress_percent
+    }
+
+def get_performance_summary(session, user_id: str, course_id: str):
+    counters = session.execute(prepared(session, "get_performance_counters"), (user_id, course_id)).one()
+    if counters:
+        return _summary_from_counters(counters, _total_lessons(course_id))
+
+    # No tracked completions: fall back to a summary written by update_performance_summary
+    row = session.execute(prepared(session, "get_performance_summary"), (user_id, course_id)).one()
     if row:
-        return {
-            "average_score": row.average_score,
-            "lessons_completed": row.lessons_completed,
-            "total_lessons": row.total_lessons,
-            "progress_percent": row.progress_percent
-        }
+        return _summary_from_row(row)
     return None
 
+def get_performance_summaries(session, user_id: str, timeout=None):
+    """
+    get_performance_summary for every course the user has progress in, keyed by
+    course_id. Two single-partition reads regardless of the number of courses,
+    sent together; `timeout` (seconds) bounds each of them instead of the
+    session's default request timeout.
+    """
+    options = {} if timeout is None else {"timeout": timeout}
+    summary_rows, counter_rows = [session.execute_async(prepared(session, name), (user_id,), **options)
+                                  for name in ("get_user_performance_summaries", "get_user_performance_counters")]
+    summaries = {row.course_id: _summary_from_row(row) for row in summary_rows.result()}
+    for counters in counter_rows.result():
+        summaries[counters.course_id] = _summary_from_counters(counters, _total_lessons(counters.course_id))
+    return summaries
+
 # --- Tracking Student Activity ---
 def log_user_activity(session, user_id: str, activity_type: str, metadata: dict):
-    cql = """
-    INSERT INTO user_activity (user_id, timestamp, activity_type, metadata)
-    VALUES (%s, toTimestamp(now()), %s, %s)
+    now = datetime.utcnow()
+    session.execute(prepared(session, "log_user_activity"), (user_id, now.date(), now, activity_type, metadata))
+
+def get_user_activity(session, user_id: str, start: datetime, end: datetime, fetch_size=DEFAULT_FETCH_SIZE):
+    """
+    Yield the user's activity between `start` and `end`, newest first.
     """
-    stmt = session.prepare(cql)
-    session.execute(stmt, (user_id, activity_type, metadata))
+    yield from _read_buckets(session, "get_user_activity", user_id, start, end, fetch_size)
 
 # --- Show Quiz Results
-def get_quiz_results(session, user_id: str, quiz_id: str):
-    cql = """
-    SELECT attempt_timestamp, score, responses
-      FROM quiz_attempts
-     WHERE user_id=%s AND quiz_id=%s;
+# Rows are plain (attempt_timestamp, score, responses) tuples, newest first.
+def get_quiz_results(session, user_id: str, quiz_id: str, limit: int = 100):
+    return session.execute(prepared(session, "get_quiz_results"), (user_id, quiz_id, limit),
+                           execution_profile=TUPLE_ROWS).all()
+
+def get_quiz_results_page(session, user_id: str, quiz_id: str, page_size: int = 20, paging_state=None):
+    """
+    Return one page of attempts and the paging_state to pass in for the next page
+    (None once there are no more attempts).
+    """
+    bound = prepared(session, "get_quiz_results").bind((user_id, quiz_id, 2 ** 31 - 1))
+    bound.fetch_size = page_size
+    result = session.execute(bound, paging_state=paging_state, execution_profile=TUPLE_ROWS)
+    return result.current_rows, result.paging_state
+
+
+# --- Direct Messages ---
+# A conversation between two users is stored in (conversation_id, month)
+# partitions clustered by a timeuuid, newest first, so no partition grows past a
+# month of one conversation. conversations records the first month, which bounds
+# how far back history reads walk.
+#
+# inbox_by_time lists each user's conversations newest first, one row per
+# conversation keyed by its latest message, so the inbox pages like history does.
+# inbox_latest points at that row: a send reads both participants' pointers,
+# writes the new row and deletes the one it replaces. Inbox writes carry the
+# message time as the cell timestamp, so a late-arriving older message never
+# replaces a newer one. Two sends racing in one conversation can both miss the
+# other's row; get_inbox checks rows against inbox_latest and deletes stale ones.
+PREVIEW_LENGTH = 100
+MESSAGE_PAGE_SIZE = 50
+INBOX_PAGE_SIZE = 20
+MESSAGE_STATEMENTS = ("start_conversation", "send_message", "get_inbox_latest", "set_inbox_latest",
+                      "add_inbox_entry", "remove_inbox_entry")
+INBOX_STATEMENTS = ("get_inbox", "get_inbox_latest", "remove_inbox_entry")
+# Conversations known to have a conversations row, so the IF NOT EXISTS insert
+# (a Paxos round) runs once per conversation rather than on every message
+_known_conversations = TTLCache(maxsize=100000, ttl=3600)
+
+# Random node id for this process's timeuuids instead of the host's MAC address
+_UUID_NODE = random.getrandbits(48) | 0x010000000000
+# 100 ns intervals between the UUID epoch (1582-10-15) and the Unix epoch
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+def _timeuuid():
+    return uuid.uuid1(node=_UUID_NODE)
+
+def _timeuuid_micros(value):
+    return (value.time - _UUID_EPOCH_OFFSET) // 10
+
+def _timeuuid_datetime(value):
+    return datetime(1970, 1, 1) + timedelta(microseconds=_timeuuid_micros(value))
+
+def conversation_id(user_a, user_b):
+    """
+    The same id for either order of the two users. The first id is length-
+    prefixed, so ids that themselves contain ":" cannot collide.
+    """
+    first, second = sorted((user_a, user_b))
+    return f"{len(first)}:{first}:{second}"
+
+def _month(dt):
+    return dt.strftime("%Y-%m")
+
+def _previous_month(month):
+    year, month = map(int, month.split("-"))
+    return f"{year - 1}-12" if month == 1 else f"{year}-{month - 1:02d}"
+
+def _start_conversation(statements, sender_id, receiver_id, sent_at):
+    user_a, user_b = sorted((sender_id, receiver_id))
+    return statements["start_conversation"], (conversation_id(user_a, user_b), user_a, user_b,
+                                              _month(_timeuuid_datetime(sent_at)))
+
+def _latest_by_conversation(rows):
+    return {row.conversation_id: row.last_message_at for row in rows}
+
+def _message_writes(statements, conv, sender_id, receiver_id, content, sent_at, latest):
+    """
+    The message insert plus, for each participant whose inbox does not already
+    show a newer message, the new inbox row, its pointer and the removal of the
+    row it replaces. `latest` maps user_id to that user's current pointer.
+    """
+    cell_timestamp = _timeuuid_micros(sent_at)
+    preview = content[:PREVIEW_LENGTH]
+    writes = [(statements["send_message"],
+               (conv, _month(_timeuuid_datetime(sent_at)), sent_at, sender_id, receiver_id, content))]
+    for user_id, other_id in ((sender_id, receiver_id), (receiver_id, sender_id)):
+        previous = latest.get(user_id)
+        if previous is not None and previous.time >= sent_at.time:
+            continue
+        writes.append((statements["set_inbox_latest"], (user_id, conv, sent_at, cell_timestamp)))
+        writes.append((statements["add_inbox_entry"],
+                       (user_id, sent_at, conv, other_id, sender_id, preview, cell_timestamp)))
+        if previous is not None:
+            writes.append((statements["remove_inbox_entry"], (cell_timestamp, user_id, previous, conv)))
+    return writes
+
+def _split_inbox(rows, latest):
+    """
+    Split inbox rows into current ones and stale ones that a newer row for the
+    same conversation has replaced.
+    """
+    current, stale = [], []
+    for row in rows:
+        pointer = latest.get(row.conversation_id)
+        (stale if pointer is not None and pointer.time > row.last_message_at.time else current).append(row)
+    return current, stale
+
+def _stale_removals(statements, user_id, stale, latest):
+    return [(statements["remove_inbox_entry"],
+             (_timeuuid_micros(latest[row.conversation_id]), user_id, row.last_message_at, row.conversation_id))
+            for row in stale]
+
+def send_message(session, sender_id: str, receiver_id: str, content: str, graph: bool = False):
+    """
+    Store a message and move the conversation to the top of both participants'
+    inboxes; the writes go out concurrently. With `graph`, also record the
+    sender -> receiver `messaged` edge in Dgraph. Returns the message's sent_at
+    timeuuid.
+    """
+    sent_at = _timeuuid()
+    conv = conversation_id(sender_id, receiver_id)
+    statements = _statements(session, *MESSAGE_STATEMENTS)
+    if _known_conversations.get(conv) is None:
+        session.execute(*_start_conversation(statements, sender_id, receiver_id, sent_at))
+        _known_conversations.set(conv, True)
+    pointers = [session.execute_async(statements["get_inbox_latest"], (user_id, [conv]))
+                for user_id in (sender_id, receiver_id)]
+    latest = {user_id: _latest_by_conversation(future.result()).get(conv)
+              for user_id, future in zip((sender_id, receiver_id), pointers)}
+    writes = _message_writes(statements, conv, sender_id, receiver_id, content, sent_at, latest)
+    for future in [session.execute_async(stmt, params) for stmt, params in writes]:
+        future.result()
+    if graph:
+        from models.dgraph_model import message_between_users
+        message_between_users(sender_id, receiver_id)
+    return sent_at
+
+def get_conversation_history(session, user_a: str, user_b: str, limit: int = MESSAGE_PAGE_SIZE, before=None):
+    """
+    Up to `limit` messages between two users, newest first, sent before the
+    `before` timeuuid (default: now). Returns (messages, next_before); pass
+    next_before back for the following page, None once the start of the
+    conversation is reached.
     """
-    stmt = session.prepare(cql)
-    return [row._asdict() for row in session.execute(stmt, (user_id, quiz_id))]
\ No newline at end of file
+    conv = conversation_id(user_a, user_b)
+    row = session.execute(prepared(session, "get_conversation"), (conv,)).one()
+    if not row:
+        return [], None
+    before = before or _timeuuid()
+    month = _month(_timeuuid_datetime(before))
+    stmt = prepared(session, "get_messages")
+    messages = []
+    while len(messages) < limit and month >= row.started_month:
+        messages.extend(session.execute(stmt, (conv, month, before, limit - len(messages))))
+        month = _previous_month(month)
+    if len(messages) < limit:
+        return messages, None
+    return messages, messages[-1].sent_at
+
+def get_inbox(session, user_id: str, limit: int = INBOX_PAGE_SIZE, before=None):
+    """
+    The user's conversations, most recent message first: one inbox_by_time slice
+    of `limit` rows before the `before` timeuuid (default: now). Returns (rows,
+    next_before); pass next_before back for the following page, None on the last
+    page. A page can hold fewer than `limit` rows when stale rows left by racing
+    sends are skipped; those are deleted in the background.
+    """
+    statements = _statements(session, *INBOX_STATEMENTS)
+    rows = list(session.execute(statements["get_inbox"], (user_id, before or _timeuuid(), limit)))
+    if not rows:
+        return [], None
+    latest = _latest_by_conversation(session.execute(statements["get_inbox_latest"],
+                                                     (user_id, [row.conversation_id for row in rows])))
+    page, stale = _split_inbox(rows, latest)
+    for stmt, params in _stale_removals(statements, user_id, stale, latest):
+        session.execute_async(stmt, params).add_errback(_log_failure)
+    return page, rows[-1].last_message_at if len(rows) == limit else None
+
+
+# --- Async Telemetry Writes ---
+class TelemetryWriter:
+    """
+    Fire-and-forget writer on top of session.execute_async. At most `max_in_flight`
+    requests are outstanding; submit() blocks the caller once the limit is reached
+    (or raises TimeoutError after `block_timeout` seconds). Failures are counted and
+    passed to `on_error(exc)`.
+    """
+
+    def __init__(self, session, max_in_flight=256, block_timeout=None, on_success=None, on_error=None):
+        self.session = session
+        self.block_timeout = block_timeout
+        self.on_success = on_success
+        self.on_error = on_error
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._drained = threading.Condition()
+        self._in_flight = 0
+
+    def submit(self, statement, params=None, then=None):
+        """
+        Send a write. `then(rows)` runs once it succeeds, before the write stops
+        counting as in flight, so anything it sends with follow_up() is always
+        waited for by flush().
+        """
+        if not self._slots.acquire(timeout=self.block_timeout):
+            raise TimeoutError("Too many Cassandra writes in flight")
+        return self._send(statement, params, then, True)
+
+    def follow_up(self, statement, params=None, then=None):
+        """
+        Send a request chained off an earlier one, from a driver callback. It never
+        blocks: it holds no in-flight slot (its parent already did), but it is
+        counted, logged on failure and waited for by flush() like any other write.
+        """
+        return self._send(statement, params, then, False)
+
+    def _send(self, statement, params, then, slot):
+        with self._drained:
+            self._in_flight += 1
+            self.submitted += 1
+        try:
+            future = self.session.execute_async(statement, params)
+        except Exception:
+            self._release("failed", slot)
+            raise
+        future.add_callbacks(self._succeeded, self._failed, callback_args=(then, slot), errback_args=(slot,))
+        return future
+
+    def _succeeded(self, result, then, slot):
+        if then:
+            try:
+                then(result)
+            except Exception as exc:
+                self._failed(exc, slot)
+                return
+        self._release("succeeded", slot)
+        if self.on_success:
+            self.on_success(result)
+
+    def _failed(self, exc, slot):
+        self._release("failed", slot)
+        log.warning("Async Cassandra write failed: %s", exc)
+        if self.on_error:
+            self.on_error(exc)
+
+    def _release(self, outcome, slot):
+        if slot:
+            self._slots.release()
+        with self._drained:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._drained.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait until every submitted write, including chained follow-ups, has
+        completed. Returns False on timeout.
+        """
+        with self._drained:
+            return self._drained.wait_for(lambda: self._in_flight == 0, timeout)
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "in_flight": self._in_flight,
+        }
+
+def _log_failure(exc):
+    log.warning("Async Cassandra write failed: %s", exc)
+
+def _send_async(session, statement, params, writer=None, then=None, chained=False):
+    """
+    execute_async through `writer` when given. `chained` marks a request sent
+    from a driver callback, which must not wait for a writer slot.
+    """
+    if writer:
+        send = writer.follow_up if chained else writer.submit
+        return send(statement, params, then)
+    future = session.execute_async(statement, params)
+    future.add_callbacks(then or (lambda _: None), _log_failure)
+    return future
+
+def _execute_async(session, name, params, writer=None):
+    return _send_async(session, prepared(session, name), params, writer)
+
+# Async variants of the telemetry writes. They return the driver's ResponseFuture;
+# pass a TelemetryWriter to bound the number of requests in flight and have
+# flush() cover the writes chained off them. Every statement a chain needs is
+# prepared before the first request goes out, since the callbacks run on the
+# driver's event-loop thread.
+def track_lesson_completion_async(session, user_id, course_id, lesson_id, score=None, writer=None):
+    completed_at = datetime.utcnow()
+    statements = _statements(session, *COMPLETION_STATEMENTS)
+
+    def record(rows):
+        _record_completion(statements, rows[0], user_id, course_id, lesson_id, score, completed_at,
+                           lambda stmt, params: _send_async(session, stmt, params, writer, chained=True))
+
+    return _send_async(session, statements["track_lesson_completion"],
+                       (user_id, lesson_id, course_id, completed_at, score), writer, then=record)
+
+def log_user_activity_async(session, user_id: str, activity_type: str, metadata: dict, writer=None):
+    now = datetime.utcnow()
+    return _execute_async(session, "log_user_activity", (user_id, now.date(), now, activity_type, metadata), writer)
+
+def log_session_async(session, user_id, login_timestamp, logout_timestamp, session_duration, device_info, writer=None):
+    return _execute_async(session, "log_session",
+                          (user_id, login_timestamp.date(), login_timestamp, logout_timestamp,
+                           session_duration, device_info), writer)
+
+def log_quiz_attempt_async(session, user_id, quiz_id, score, responses, writer=None):
+    attempted_at = datetime.utcnow()
+    statements = _statements(session, *QUIZ_ATTEMPT_STATEMENTS)
+
+    def update_summary(row, tries_left):
+        def check(rows):
+            if rows[0][0]:
+                return
+            if tries_left > 1:
+                update_summary(_current_quiz_summary(rows[0]), tries_left - 1)
+            else:
+                _quiz_summary_lost(user_id, quiz_id)
+
+        stmt, params = _quiz_summary_write(statements, user_id, quiz_id, row, score, attempted_at)
+        _send_async(session, stmt, params, writer, then=check, chained=True)
+
+    def read_summary(_):
+        _send_async(session, statements["get_quiz_summary"], (user_id, quiz_id), writer,
+                    then=lambda rows: update_summary(rows[0] if rows else None, QUIZ_SUMMARY_RETRIES), chained=True)
+
+    return _send_async(session, statements["log_quiz_attempt"], (user_id, quiz_id, attempted_at, score, responses),
+                       writer, then=read_summary)
@@ -0,0 +1,239 @@
+from db.connections import mongo_db
+from db.dgraph_client import get_dgraph_client
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pymongo import ReplaceOne
+import argparse
+import hashlib
+import json
+import os
+import time
+
+# Offline item-item recommendations. A batch job exports every enrolled/completed
+# edge from Dgraph, builds a sparse student x course matrix and stores the
+# SIMILARITY_TOP_K most similar courses (cosine over shared students) for each
+# course in the Mongo course_similarities collection. recommend_courses(...,
+# precomputed=True) then serves from that table with one lookup and a merge.
+#
+# Each stored course carries a fingerprint of its student set. A run only
+# recomputes and rewrites the courses whose fingerprint changed, plus the courses
+# whose scores those changes can move: any course sharing a student with a changed
+# course, or listing one among its neighbors. The export itself is always full,
+# since Dgraph edges carry no modification time.
+#
+# numpy and scipy are only needed by the batch job, not for serving.
+
+SIMILARITY_TOP_K = int(os.getenv("SIMILARITY_TOP_K", "50"))
+SIMILARITY_WORKERS = int(os.getenv("SIMILARITY_WORKERS", str(os.cpu_count() or 1)))
+EXPORT_PAGE_SIZE = 1000
+BLOCK_SIZE = 256  # courses per similarity block handed to a worker
+WRITE_BATCH_SIZE = 1000
+
+EXPORT_QUERY = """
+query export($first: int, $after: string) {
+  students(func: has(student_id), first: $first, after: $after) {
+    uid
+    enrolled { course_id title }
+    completed { course_id title }
+  }
+}
+"""
+
+
+# --- Export ---
+def export_enrollments(client, page_size=EXPORT_PAGE_SIZE):
+    """
+    Page through every student and return (matrix, student_uids, course_ids,
+    titles): a binary CSR student x course matrix with a 1 wherever the student
+    is enrolled in or has completed the course.
+    """
+    import numpy as np
+    from scipy import sparse
+    from array import array
+
+    rows, cols = array("i"), array("i")
+    student_uids, course_index, titles = [], {}, {}
+    after = "0x0"
+    while True:
+        variables = {"$first": str(page_size), "$after": after}
+        students = json.loads(client.txn(read_only=True).query(EXPORT_QUERY, variables=variables).json)["students"]
+        for student in students:
+            row = len(student_uids)
+            student_uids.append(int(student["uid"], 16))
+            for course in student.get("enrolled", []) + student.get("completed", []):
+                course_id = course.get("course_id")
+                if course_id is None:
+                    continue
+                if course_id not in course_index:
+                    course_index[course_id] = len(course_index)
+                    titles[course_id] = course.get("title")
+                rows.append(row)
+                cols.append(course_index[course_id])
+        if len(students) < page_size:
+            break
+        after = students[-1]["uid"]
+
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (np.frombuffer(rows, dtype=np.int32),
+                                                                       np.frombuffer(cols, dtype=np.int32))),
+                               shape=(len(student_uids), len(course_index)))
+    # Duplicates were summed on construction; enrolled and completed on the same course count once
+    matrix.data[:] = 1
+    return matrix, np.array(student_uids, dtype=np.int64), list(course_index), titles
+
+
+def course_fingerprints(matrix, student_uids):
+    """
+    sha1 of each course's sorted student uids, aligned with the matrix columns.
+    """
+    import numpy as np
+
+    by_course = matrix.tocsc()
+    return [hashlib.sha1(np.sort(student_uids[by_course.indices[by_course.indptr[j]:by_course.indptr[j + 1]]])
+                         .tobytes()).hexdigest()
+            for j in range(matrix.shape[1])]
+
+
+# --- Similarity ---
+def _top_k_block(course_by_student, matrix, norms, courses, k):
+    """
+    Top-k cosine neighbours for a block of courses: one sparse product gives the
+    shared-student counts against every course, then each row is cut to k.
+    """
+    import numpy as np
+
+    shared = (course_by_student[courses] @ matrix).tocsr()
+    results = []
+    for i, course in enumerate(courses):
+        start, end = shared.indptr[i], shared.indptr[i + 1]
+        others, counts = shared.indices[start:end], shared.data[start:end]
+        keep = others != course
+        others, counts = others[keep], counts[keep]
+        scores = counts / (norms[course] * norms[others])
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+            others, scores = others[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        results.append((course, others[order], scores[order]))
+    return results
+
+
+def top_k_similarities(matrix, courses, k=SIMILARITY_TOP_K, workers=SIMILARITY_WORKERS):
+    """
+    Yield (course, neighbour columns, scores) for each column index in `courses`,
+    with blocks of BLOCK_SIZE courses computed on `workers` threads.
+    """
+    import numpy as np
+
+    course_by_student = matrix.T.tocsr()
+    norms = np.sqrt(np.asarray(matrix.sum(axis=0)).ravel())
+    blocks = [courses[i:i + BLOCK_SIZE] for i in range(0, len(courses), BLOCK_SIZE)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(lambda block: _top_k_block(course_by_student, matrix, norms, block, k), blocks):
+            yield from results
+
+
+def _affected_courses(matrix, changed, listed_by):
+    """
+    Column indices whose neighbour lists can change when the `changed` columns
+    do: the changed courses, every course sharing a student with one, and the
+    courses in `listed_by` that currently list one as a neighbour.
+    """
+    import numpy as np
+
+    if not len(changed):
+        return np.array(listed_by, dtype=np.int64)
+    students = np.unique(matrix.tocsc()[:, changed].indices)
+    sharing = np.unique(matrix[students].indices) if len(students) else np.array([], dtype=np.int64)
+    return np.union1d(np.union1d(changed, sharing), np.array(listed_by, dtype=np.int64)).astype(np.int64)
+
+
+# --- Batch Job ---
+def compute_course_similarities(client=None, db=None, k=SIMILARITY_TOP_K, workers=SIMILARITY_WORKERS, full=False):
+    """
+    Refresh course_similarities from the current Dgraph enrollments. Only
+    courses affected by enrollment changes since the last run are recomputed
+    unless `full` is set.
+    """
+    import numpy as np
+
+    client = client or get_dgraph_client()
+    db = mongo_db() if db is None else db
+    start = time.perf_counter()
+
+    matrix, student_uids, course_ids, titles = export_enrollments(client)
+    fingerprints = course_fingerprints(matrix, student_uids)
+    exported = time.perf_counter()
+    print(f"Exported {matrix.nnz} edges for {matrix.shape[1]} courses and {matrix.shape[0]} students "
+          f"in {exported - start:.1f}s")
+
+    column = {course_id: j for j, course_id in enumerate(course_ids)}
+    stored = {doc["_id"]: doc["fingerprint"] for doc in db.course_similarities.find({}, {"fingerprint": 1})}
+    removed = [course_id for course_id in stored if course_id not in column]
+    if full:
+        courses = np.arange(len(course_ids), dtype=np.int64)
+    else:
+        changed = [j for j, course_id in enumerate(course_ids) if stored.get(course_id) != fingerprints[j]]
+        changed_ids = [course_ids[j] for j in changed] + removed
+        listed_by = [column[doc["_id"]] for doc in
+                     db.course_similarities.find({"neighbors.course_id": {"$in": changed_ids}}, {"_id": 1})
+                     if doc["_id"] in column] if changed_ids else []
+        courses = _affected_courses(matrix, np.array(changed, dtype=np.int64), listed_by)
+
+    now = datetime.utcnow()
+    ops, written = [], 0
+    for course, others, scores in top_k_similarities(matrix, courses, k, workers):
+        neighbors = [{"course_id": course_ids[j], "title": titles.get(course_ids[j]), "score": float(score)}
+                     for j, score in zip(others, scores)]
+        ops.append(ReplaceOne({"_id": course_ids[course]},
+                              {"fingerprint": fingerprints[course], "neighbors": neighbors, "updated_at": now},
+                              upsert=True))
+        if len(ops) >= WRITE_BATCH_SIZE:
+            db.course_similarities.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+    if ops:
+        db.course_similarities.bulk_write(ops, ordered=False)
+        written += len(ops)
+    if removed:
+        db.course_similarities.delete_many({"_id": {"$in": removed}})
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Recomputed {written} of {len(course_ids)} courses ({len(removed)} removed) in {elapsed:.1f}s")
+    return {"courses": len(course_ids), "recomputed": written, "removed": len(removed), "seconds": elapsed}
+
+
+# --- Serving ---
+def merge_neighbors(docs, exclude, limit, offset=0):
+    """
+    Sum the neighbour scores of the given course_similarities documents and
+    return the best `limit` courses after `offset`, skipping `exclude`.
+    """
+    scores, titles = defaultdict(float), {}
+    for doc in docs:
+        for neighbor in doc.get("neighbors", []):
+            course_id = neighbor["course_id"]
+            if course_id not in exclude:
+                scores[course_id] += neighbor["score"]
+                titles[course_id] = neighbor.get("title")
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[offset:offset + limit]
+    return [{"course_id": course_id, "title": titles[course_id], "score": score} for course_id, score in ranked]
+
+
+def recommend_from_similarities(course_ids, limit=5, offset=0, db=None):
+    """
+    Recommendations for a student who takes `course_ids`, from the precomputed table.
+    """
+    db = mongo_db() if db is None else db
+    course_ids = list(course_ids)
+    docs = db.course_similarities.find({"_id": {"$in": course_ids}}, {"neighbors": 1})
+    return merge_neighbors(docs, set(course_ids), limit, offset)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute course-course similarities from Dgraph enrollments.")
+    parser.add_argument("--top-k", type=int, default=SIMILARITY_TOP_K)
+    parser.add_argument("--workers", type=int, default=SIMILARITY_WORKERS)
+    parser.add_argument("--full", action="store_true", help="recompute every course, not just changed ones")
+    args = parser.parse_args()
+    compute_course_similarities(k=args.top_k, workers=args.workers, full=args.full)
@@ -0,0 +1,91 @@
+from db.connections import cassandra_session
+from models.mongo_model import get_user_profile
+from models.cassandra_model import get_performance_summaries
+from models.dgraph_model import get_student_courses
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import os
+import threading
+import time
+
+# Student dashboard assembled from all three stores at once. Each store is queried
+# on its own small thread pool and given its own time budget; a store that is slow
+# or failing leaves its section as None and is reported in "errors" instead of
+# holding up the others, so the dashboard takes about as long as the slowest
+# store that answers in time.
+#
+# The budget left when a load starts is passed down to the driver (Mongo
+# max_time_ms, the Cassandra request timeout, the Dgraph gRPC deadline), so a
+# query given up on also stops holding its pool thread shortly after. A slow
+# store can only back up its own pool; loads that waited there past their
+# deadline are dropped without being sent.
+
+# Per-store budgets in seconds, counted from the start of the request
+DEFAULT_TIMEOUTS = {"mongo": 1.0, "cassandra": 1.0, "dgraph": 1.5}
+# Threads per store
+DASHBOARD_WORKERS = int(os.getenv("DASHBOARD_WORKERS", "8"))
+
+# store -> (dashboard section, loader(user_id, timeout))
+SECTIONS = {
+    "mongo": ("profile", lambda user_id, timeout: get_user_profile(user_id, timeout=timeout)),
+    "cassandra": ("performance",
+                  lambda user_id, timeout: get_performance_summaries(cassandra_session(), user_id, timeout=timeout)),
+    "dgraph": ("courses", lambda user_id, timeout: get_student_courses(user_id, timeout=timeout)),
+}
+
+_executors = {}
+_executor_lock = threading.Lock()
+
+
+def _pool(store):
+    executor = _executors.get(store)
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(store)
+            if executor is None:
+                executor = _executors[store] = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS,
+                                                                  thread_name_prefix=f"dashboard-{store}")
+    return executor
+
+
+def _timed(load, user_id, deadline):
+    start = time.perf_counter()
+    remaining = deadline - start
+    if remaining <= 0:
+        return None, "timed out waiting for a worker", 0.0
+    try:
+        return load(user_id, remaining), None, time.perf_counter() - start
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", time.perf_counter() - start
+
+
+def get_student_dashboard(user_id: str, timeouts: dict = None):
+    """
+    Return the user's profile and bookmarks (MongoDB), per-course performance
+    (Cassandra) and enrolled/completed courses (Dgraph), with per-store timings
+    in milliseconds. Sections whose store failed or exceeded its timeout are None
+    and listed in "errors"; "partial" is True when any section is missing.
+
+    Each driver call is given the store's remaining budget as its own deadline,
+    so a timed-out query is abandoned by the driver as well.
+    """
+    timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+    start = time.perf_counter()
+    futures = {store: _pool(store).submit(_timed, load, user_id, start + timeouts[store])
+               for store, (_, load) in SECTIONS.items()}
+
+    dashboard = {"user_id": user_id, "timings_ms": {}, "errors": {}}
+    for store, future in futures.items():
+        section = SECTIONS[store][0]
+        remaining = start + timeouts[store] - time.perf_counter()
+        try:
+            value, error, elapsed = future.result(timeout=max(remaining, 0))
+        except TimeoutError:
+            value, error, elapsed = None, f"timed out after {timeouts[store]}s", time.perf_counter() - start
+        dashboard[section] = value
+        if error:
+            dashboard["errors"][store] = error
+        dashboard["timings_ms"][store] = round(elapsed * 1000, 1)
+
+    dashboard["timings_ms"]["total"] = round((time.perf_counter() - start) * 1000, 1)
+    dashboard["partial"] = bool(dashboard["errors"])
+    return dashboard
@@ -0,0 +1,130 @@
+from db.dgraph_client import get_dgraph_client
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+import json
+import random
+import time
+import pydgraph
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_RETRIES = 5
+
+STUDENT = ("Student", "student_id")
+INSTRUCTOR = ("Instructor", "instructor_id")
+COURSE = ("Course", "course_id")
+
+
+def _chunks(pairs, size):
+    it = iter(pairs)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _build_upsert(chunk, source, edge, target):
+    """
+    Build one upsert block for a chunk of (source_id, target_id) pairs: a var per
+    distinct external id and one `edge` N-Quad per pair.
+    """
+    variables, blocks, nquads, names = {}, [], [], {}
+
+    def var_for(kind, id_pred, node_id):
+        key = (id_pred, node_id)
+        if key not in names:
+            name = f"v{len(names)}"
+            names[key] = name
+            variables[f"${name}"] = str(node_id)
+            blocks.append(f"{name} as var(func: eq({id_pred}, ${name}))")
+            nquads.append(f'uid({name}) <dgraph.type> "{kind}" .')
+            nquads.append(f"uid({name}) <{id_pred}> {json.dumps(str(node_id))} .")
+        return names[key]
+
+    for src_id, dst_id in chunk:
+        src = var_for(*source, src_id)
+        dst = var_for(*target, dst_id)
+        nquads.append(f"uid({src}) <{edge}> uid({dst}) .")
+
+    declared = ", ".join(f"{name}: string" for name in variables)
+    query = f"query q({declared}) {{\n  " + "\n  ".join(blocks) + "\n}"
+    return query, variables, "\n".join(nquads)
+
+
+def _commit_chunk(client, chunk, source, edge, target, max_retries):
+    """
+    Commit one chunk as a single transaction, retrying with backoff when Dgraph
+    aborts it because a concurrent worker touched the same nodes.
+    Returns the number of retries that were needed.
+    """
+    query, variables, nquads = _build_upsert(chunk, source, edge, target)
+    for attempt in range(max_retries + 1):
+        txn = client.txn()
+        try:
+            mutation = txn.create_mutation(set_nquads=nquads)
+            txn.do_request(txn.create_request(query=query, variables=variables,
+                                              mutations=[mutation], commit_now=True))
+            return attempt
+        except (pydgraph.AbortedError, pydgraph.RetriableError):
+            if attempt == max_retries:
+                raise
+            time.sleep(min(2 ** attempt * 0.05, 2.0) * (1 + random.random()))
+        finally:
+            txn.discard()
+
+
+def bulk_link(pairs, source, edge, target, chunk_size=DEFAULT_CHUNK_SIZE,
+              workers=DEFAULT_WORKERS, max_retries=DEFAULT_MAX_RETRIES, client=None):
+    """
+    Write `edge` for every (source_id, target_id) pair in `pairs`, upserting both
+    endpoints by external id. Pairs are consumed lazily in chunks of `chunk_size`;
+    each chunk is one transaction and up to `workers` chunks are in flight at once.
+    Returns throughput stats.
+    """
+    client = client or get_dgraph_client()
+    stats = {"edges": 0, "chunks": 0, "retries": 0}
+    start = time.perf_counter()
+
+    def collect(done):
+        for future in done:
+            retries, size = future.result()
+            stats["retries"] += retries
+            stats["edges"] += size
+            stats["chunks"] += 1
+
+    def run(chunk):
+        return _commit_chunk(client, chunk, source, edge, target, max_retries), len(chunk)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in _chunks(pairs, chunk_size):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(pool.submit(run, chunk))
+        collect(wait(pending).done)
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["edges_per_sec"] = stats["edges"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"{edge}: {stats['edges']} edges in {stats['chunks']} transactions, "
+          f"{stats['retries']} retries, {stats['edges_per_sec']:.0f} edges/sec")
+    return stats
+
+
+# --- Bulk Variants of dgraph_model Edges ---
+def bulk_enroll_students(pairs, **kwargs):
+    """pairs: iterable of (student_id, course_id)"""
+    return bulk_link(pairs, STUDENT, "enrolled", COURSE, **kwargs)
+
+def bulk_instructor_teaches(pairs, **kwargs):
+    """pairs: iterable of (instructor_id, course_id)"""
+    return bulk_link(pairs, INSTRUCTOR, "teaches", COURSE, **kwargs)
+
+def bulk_student_follows_instructor(pairs, **kwargs):
+    """pairs: iterable of (student_id, instructor_id)"""
+    return bulk_link(pairs, STUDENT, "follows", INSTRUCTOR, **kwargs)
+
+def bulk_mark_courses_completed(pairs, **kwargs):
+    """pairs: iterable of (student_id, course_id)"""
+    return bulk_link(pairs, STUDENT, "completed", COURSE, **kwargs)
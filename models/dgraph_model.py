@@ -1,22 +1,36 @@
-from db.dgraph_client import create_dgraph_client
+from db.dgraph_client import get_dgraph_client
+from models.prerequisites import check_new_prerequisite, invalidate_prerequisite_graph, missing_prerequisites
 from datetime import datetime
+import base64
+import json
+import os
+import pydgraph
 
 def set_dgraph_schema(client):
     schema = """
-    student_id: string @index(exact) .
-    course_id: string @index(exact) .
-    instructor_id: string @index(exact) .
-    assignment_id: string @index(exact) .
+    student_id: string @index(exact) @upsert .
+    course_id: string @index(exact) @upsert .
+    instructor_id: string @index(exact) @upsert .
+    assignment_id: string @index(exact) @upsert .
     enrolled: [uid] @reverse .
     teaches: [uid] @reverse .
     assigned_to: [uid] @reverse .
     submitted: [uid] @reverse .
     messaged: [uid] @reverse .
     follows: [uid] @reverse .
+    completed: [uid] @reverse .
+    prerequisite: [uid] @reverse .
+    post_id: string @index(exact) @upsert .
+    user_id: string @index(exact) @upsert .
+    content: string .
+    timestamp: datetime @index(hour) .
+    author: uid @reverse .
+    replies: [uid] @reverse @count .
 
     type Student {
         student_id
         enrolled
+        completed
         messaged
         follows
     }
@@ -30,204 +44,370 @@ def set_dgraph_schema(client):
     type Course {
         course_id
         assigned_to
+        prerequisite
     }
 
     type Assignment {
         assignment_id
         submitted
     }
+
+    type Post {
+        post_id
+        author
+        content
+        timestamp
+        replies
+    }
+
+    type User {
+        user_id
+        messaged
+    }
     """
     client.alter(pydgraph.Operation(schema=schema))
 
+# All functions below use the shared, pooled client from db.dgraph_client
+# unless an explicit client is passed in.
+
+# --- Upsert Helpers ---
+def _node(var, node_type, id_pred, node_id, **extra):
+    node = {"uid": f"uid({var})", "dgraph.type": node_type, id_pred: node_id}
+    node.update(extra)
+    return node
+
+def _upsert_request(txn, source, edge, target):
+    """
+    Build an upsert request linking two nodes identified by their external ids,
+    creating either node only if no node with that id exists yet. `source` and
+    `target` are (dgraph_type, id_predicate, id_value) tuples, optionally followed
+    by a dict of extra scalar values to set on the node.
+    """
+    src_type, src_pred, src_id, *src_extra = source
+    dst_type, dst_pred, dst_id, *dst_extra = target
+    query = f"""
+    query q($src: string, $dst: string) {{
+      src as var(func: eq({src_pred}, $src))
+      dst as var(func: eq({dst_pred}, $dst))
+    }}
+    """
+    data = _node("src", src_type, src_pred, src_id, **(src_extra[0] if src_extra else {}))
+    data[edge] = [_node("dst", dst_type, dst_pred, dst_id, **(dst_extra[0] if dst_extra else {}))]
+
+    mutation = txn.create_mutation(set_obj=data)
+    return txn.create_request(query=query, variables={"$src": src_id, "$dst": dst_id},
+                              mutations=[mutation], commit_now=True)
+
+def _upsert_edge(client, source, edge, target):
+    txn = client.txn()
+    return txn.do_request(_upsert_request(txn, source, edge, target))
+
 # --- Enroll Student ---
-def enroll_student(student_id, course_id):
-    client, stub = create_dgraph_client()
-    try:
-        txn = client.txn()
-        data = {
-            "uid": f"_:{student_id}",
-            "dgraph.type": "Student",
-            "student_id": student_id,
-            "enrolled": [
-                {
-                    "uid": f"_:{course_id}",
-                    "dgraph.type": "Course",
-                    "course_id": course_id
-                }
-            ]
-        }
-        response = txn.mutate(set_obj=data, commit_now=True)
-        print(f"{student_id} enrolled in {course_id}")
-        print("Generated UIDs:", response.uids)
-    finally:
-        stub.close()
+def enroll_student(student_id, course_id, client=None, check_prerequisites=False):
+    client = client or get_dgraph_client()
+    if check_prerequisites:
+        missing = missing_prerequisites(student_id, course_id, client)
+        if missing:
+            print(f"{student_id} cannot enroll in {course_id}; missing prerequisites: {', '.join(missing)}")
+            return False
+    response = _upsert_edge(client, ("Student", "student_id", student_id), "enrolled",
+                            ("Course", "course_id", course_id))
+    print(f"{student_id} enrolled in {course_id}")
+    print("Generated UIDs:", response.uids)
+    return True
 
 # --- Create Instructor Teaching Relationship ---
-def instructor_teaches(instructor_id, course_id):
-    client, stub = create_dgraph_client()
-    try:
-        txn = client.txn()
-        data = {
-            "uid": f"_:{instructor_id}",
-            "dgraph.type": "Instructor",
-            "instructor_id": instructor_id,
-            "teaches": [
-                {
-                    "uid": f"_:{course_id}",
-                    "dgraph.type": "Course",
-                    "course_id": course_id
-                }
-            ]
-        }
-        txn.mutate(set_obj=data, commit_now=True)
-        print(f"{instructor_id} now teaches {course_id}")
-    finally:
-        stub.close()
+def instructor_teaches(instructor_id, course_id, client=None):
+    client = client or get_dgraph_client()
+    _upsert_edge(client, ("Instructor", "instructor_id", instructor_id), "teaches",
+                 ("Course", "course_id", course_id))
+    print(f"{instructor_id} now teaches {course_id}")
 
 # --- Submit Assignment ---
-def submit_assignment(student_id, assignment_id, score):
-    client, stub = create_dgraph_client()
-    try:
-        txn = client.txn()
-        data = {
-            "uid": f"_:{student_id}",
-            "dgraph.type": "Student",
-            "student_id": student_id,
-            "submitted": [
-                {
-                    "uid": f"_:{assignment_id}",
-                    "dgraph.type": "Assignment",
-                    "assignment_id": assignment_id,
-                    "score": score
-                }
-            ]
-        }
-        response = txn.mutate(set_obj=data, commit_now=True)
-        print(f"{student_id} submitted {assignment_id}")
-        print("Generated UIDs:", response.uids)
-    finally:
-        stub.close()
+def submit_assignment(student_id, assignment_id, score, client=None):
+    client = client or get_dgraph_client()
+    response = _upsert_edge(client, ("Student", "student_id", student_id), "submitted",
+                            ("Assignment", "assignment_id", assignment_id, {"score": score}))
+    print(f"{student_id} submitted {assignment_id}")
+    print("Generated UIDs:", response.uids)
 
 # --- Student Follows Instructor ---
-def student_follows_instructor(student_id, instructor_id):
-    client, stub = create_dgraph_client()
-    try:
-        txn = client.txn()
-        data = {
-            "uid": f"_:{student_id}",
-            "dgraph.type": "Student",
-            "student_id": student_id,
-            "follows": [
-                {
-                    "uid": f"_:{instructor_id}",
-                    "dgraph.type": "Instructor",
-                    "instructor_id": instructor_id
-                }
-            ]
-        }
-        response = txn.mutate(set_obj=data, commit_now=True)
-        print(f"{student_id} now follows {instructor_id}")
-        print("Generated UIDs:", response.uids)
-    finally:
-        stub.close()
-
-# --- Message Between Student and Instructor ---
-def message_between_users(sender_id, receiver_id, content):
-    client, stub = create_dgraph_client()
-    try:
-        txn = client.txn()
-        data = {
-            "uid": f"_:{sender_id}",
-            "messaged": [
-                {
-                    "uid": f"_:{receiver_id}",
-                    "content": content,
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-            ]
-        }
-        txn.mutate(set_obj=data, commit_now=True)
-        print(f"{sender_id} messaged {receiver_id}")
-    finally:
-        stub.close()
+def student_follows_instructor(student_id, instructor_id, client=None):
+    client = client or get_dgraph_client()
+    response = _upsert_edge(client, ("Student", "student_id", student_id), "follows",
+                            ("Instructor", "instructor_id", instructor_id))
+    print(f"{student_id} now follows {instructor_id}")
+    print("Generated UIDs:", response.uids)
+
+# --- Message Between Users ---
+# Message bodies live in Cassandra (models.cassandra_model.send_message); the graph
+# only keeps who has messaged whom, as one deduplicated edge per pair.
+def message_between_users(sender_id, receiver_id, client=None):
+    client = client or get_dgraph_client()
+    _upsert_edge(client, ("User", "user_id", sender_id), "messaged", ("User", "user_id", receiver_id))
+    print(f"{sender_id} messaged {receiver_id}")
 
 # --- Personalized Course Recommendations ---
-def recommend_courses(student_id: str, limit: int = 5):
-    query = f'''
-    {{
-      rec(func: eq(student_id, "{student_id}")) @cascade {{
-        enrolled {{
-          teaches {{
-            enrolled(first: {limit}) {{
-              course_id
-              title
-            }}
-          }}
-        }}
-      }}
-    }}
-    '''
-    client, stub = create_dgraph_client()
-    try:
-        res = client.txn(read_only=True).query(query)
-        return res.json
-    finally:
-        stub.close()
+# Collaborative filtering over co-enrollment: peers are students enrolled in the
+# same courses (reached through ~enrolled), and every course those peers take
+# that the student has neither enrolled in nor completed is scored by how many
+# peers take it. The walk is capped at each hop (RECOMMEND_SEEDS of the
+# student's courses, RECOMMEND_PEERS enrollees per course, RECOMMEND_FANOUT
+# courses per peer) so the cost stays bounded on popular courses with millions
+# of enrollment edges; the query also carries a client-side deadline.
+RECOMMEND_SEEDS = int(os.getenv("RECOMMEND_SEEDS", "50"))
+RECOMMEND_PEERS = int(os.getenv("RECOMMEND_PEERS", "200"))
+RECOMMEND_FANOUT = int(os.getenv("RECOMMEND_FANOUT", "50"))
+RECOMMEND_TIMEOUT = float(os.getenv("RECOMMEND_TIMEOUT", "2.0"))
+
+RECOMMEND_QUERY = """
+query recommend($sid: string, $first: int, $offset: int, $seeds: int, $peers: int, $fanout: int) {
+  me as var(func: eq(student_id, $sid)) {
+    mine as enrolled
+    done as completed
+  }
+  var(func: uid(mine), first: $seeds) {
+    peers as ~enrolled(first: $peers) @filter(NOT uid(me))
+  }
+  var(func: uid(peers)) {
+    candidates as enrolled(first: $fanout) @filter(NOT uid(mine) AND NOT uid(done))
+  }
+  var(func: uid(candidates)) {
+    overlap as count(~enrolled @filter(uid(peers)))
+  }
+  recommendations(func: uid(overlap), orderdesc: val(overlap), first: $first, offset: $offset) {
+    course_id
+    title
+    score: val(overlap)
+  }
+}
+"""
+
+def _recommend_variables(student_id, limit, offset):
+    # DQL variables are always passed as strings
+    return {"$sid": student_id, "$first": str(limit), "$offset": str(offset), "$seeds": str(RECOMMEND_SEEDS),
+            "$peers": str(RECOMMEND_PEERS), "$fanout": str(RECOMMEND_FANOUT)}
+
+def recommend_courses(student_id: str, limit: int = 5, client=None, offset: int = 0, timeout=RECOMMEND_TIMEOUT,
+                      precomputed: bool = False):
+    """
+    Courses taken by the student's co-enrolled peers, most shared first, as a list
+    of {"course_id", "title", "score"}. Page with `offset`.
+
+    With `precomputed`, only the student's courses are read from Dgraph and the
+    ranking comes from the course_similarities table built by
+    models/course_similarity.py.
+    """
+    client = client or get_dgraph_client()
+    if precomputed:
+        from models.course_similarity import recommend_from_similarities
+        courses = get_student_courses(student_id, client)
+        return recommend_from_similarities(courses["enrolled"] + courses["completed"], limit, offset)
+    res = client.txn(read_only=True).query(RECOMMEND_QUERY, variables=_recommend_variables(student_id, limit, offset),
+                                           timeout=timeout)
+    return json.loads(res.json).get("recommendations", [])
+
+# --- Student Courses ---
+STUDENT_COURSES_QUERY = """
+query courses($sid: string) {
+  student(func: eq(student_id, $sid)) {
+    enrolled { course_id }
+    completed { course_id }
+  }
+}
+"""
+
+def _student_courses(data):
+    student = data["student"][0] if data.get("student") else {}
+    return {edge: [course["course_id"] for course in student.get(edge, []) if "course_id" in course]
+            for edge in ("enrolled", "completed")}
+
+def get_student_courses(student_id: str, client=None, timeout=None):
+    """
+    Course ids the student is enrolled in and has completed.
+    """
+    client = client or get_dgraph_client()
+    res = client.txn(read_only=True).query(STUDENT_COURSES_QUERY, variables={"$sid": student_id}, timeout=timeout)
+    return _student_courses(json.loads(res.json))
 
 # --- Discussion Forum & Social Interactions ---
-def create_forum_post(post_id: str, user_id: str, content: str):
-    data = {
-      "uid": f"_:{post_id}",
-      "dgraph.type": "Post",
-      "post_id": post_id,
-      "author": [{"uid": f"_:{user_id}"}],
-      "content": content,
-      "timestamp": datetime.utcnow().isoformat()
+# Posts and their authors are upserted by post_id/user_id. A reply hangs off its
+# parent's `replies` edge; threads are read a page of direct replies at a time,
+# ordered by the indexed timestamp, with nested replies expanded to a fixed depth.
+#
+# Timestamps are not unique, so a page cursor is the timestamp of the page's last
+# item plus the uids already returned at that timestamp. The next page is read
+# from that timestamp inclusive (ge/le), over-fetching by the number of those
+# uids, which are then dropped; posts sharing a timestamp across a page boundary
+# are neither skipped nor repeated.
+FORUM_PAGE_SIZE = 20
+THREAD_DEPTH = 3
+_EPOCH = "0001-01-01T00:00:00Z"
+_END_OF_TIME = "9999-12-31T23:59:59Z"
+
+def _post_node(var, author_var, post_id, user_id, content):
+    return _node(var, "Post", "post_id", post_id, content=content, timestamp=datetime.utcnow().isoformat(),
+                 author=_node(author_var, "User", "user_id", user_id))
+
+def _post_request(txn, post_id, user_id, content):
+    query = """
+    query q($post: string, $author: string) {
+      post as var(func: eq(post_id, $post))
+      author as var(func: eq(user_id, $author))
     }
-    client, stub = create_dgraph_client()
-    try:
-        client.txn().mutate(set_obj=data, commit_now=True)
-    finally:
-        stub.close()
-
-def reply_to_post(parent_id: str, reply_id: str, user_id: str, content: str):
-    data = {
-      "uid": f"_:{parent_id}",
-      "replies": [{
-        "uid": f"_:{reply_id}",
-        "dgraph.type": "Post",
-        "post_id": reply_id,
-        "author": [{"uid": f"_:{user_id}"}],
-        "content": content,
-        "timestamp": datetime.utcnow().isoformat()
-      }]
+    """
+    mutation = txn.create_mutation(set_obj=_post_node("post", "author", post_id, user_id, content))
+    return txn.create_request(query=query, variables={"$post": post_id, "$author": user_id},
+                              mutations=[mutation], commit_now=True)
+
+def _reply_request(txn, parent_id, reply_id, user_id, content):
+    query = """
+    query q($parent: string, $reply: string, $author: string) {
+      parent as var(func: eq(post_id, $parent))
+      reply as var(func: eq(post_id, $reply))
+      author as var(func: eq(user_id, $author))
     }
-    client, stub = create_dgraph_client()
-    try:
-        client.txn().mutate(set_obj=data, commit_now=True)
-    finally:
-        stub.close()
+    """
+    data = {"uid": "uid(parent)", "replies": [_post_node("reply", "author", reply_id, user_id, content)]}
+    # Only reply to a post that exists, rather than creating an empty parent
+    mutation = txn.create_mutation(set_obj=data, cond="@if(eq(len(parent), 1))")
+    return txn.create_request(query=query, variables={"$parent": parent_id, "$reply": reply_id, "$author": user_id},
+                              mutations=[mutation], commit_now=True)
+
+def create_forum_post(post_id: str, user_id: str, content: str, client=None):
+    client = client or get_dgraph_client()
+    txn = client.txn()
+    txn.do_request(_post_request(txn, post_id, user_id, content))
+
+def reply_to_post(parent_id: str, reply_id: str, user_id: str, content: str, client=None):
+    client = client or get_dgraph_client()
+    txn = client.txn()
+    txn.do_request(_reply_request(txn, parent_id, reply_id, user_id, content))
+
+THREAD_QUERY = """
+query thread($pid: string, $first: int, $after: string, $depth: int) {
+  root as var(func: eq(post_id, $pid)) {
+    page as replies @filter(ge(timestamp, $after))
+  }
+  post(func: uid(root)) {
+    post_id
+    content
+    timestamp
+    author { user_id }
+    reply_count: count(replies)
+  }
+  replies(func: uid(page), orderasc: timestamp, first: $first) @recurse(depth: $depth, loop: false) {
+    uid
+    post_id
+    content
+    timestamp
+    author
+    user_id
+    replies
+  }
+}
+"""
+
+RECENT_POSTS_QUERY = """
+query recent($first: int, $before: string) {
+  posts(func: le(timestamp, $before), orderdesc: timestamp, first: $first) @filter(type(Post) AND NOT has(~replies)) {
+    uid
+    post_id
+    content
+    timestamp
+    author { user_id }
+    reply_count: count(replies)
+  }
+}
+"""
+
+def _encode_cursor(timestamp, uids):
+    return base64.urlsafe_b64encode(json.dumps([timestamp, sorted(uids)]).encode()).decode()
+
+def _decode_cursor(cursor):
+    """
+    (timestamp, uids already returned at it), or (None, empty set) for the first page.
+    """
+    if not cursor:
+        return None, frozenset()
+    timestamp, uids = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return timestamp, frozenset(uids)
+
+def _thread_variables(post_id, depth, first, after):
+    # @recurse counts edge hops: the page's own level, `depth` nested reply levels
+    # and the author hop below the deepest of them
+    timestamp, seen = _decode_cursor(after)
+    return {"$pid": post_id, "$first": str(first + len(seen)), "$after": timestamp or _EPOCH,
+            "$depth": str(depth + 2)}
+
+def _recent_posts_variables(first, before):
+    timestamp, seen = _decode_cursor(before)
+    return {"$first": str(first + len(seen)), "$before": timestamp or _END_OF_TIME}
+
+def _page(items, first, cursor):
+    """
+    Drop the items `cursor` says were already returned and keep `first`.
+    Returns (items, next cursor); the cursor is None once the query came back
+    short, i.e. there is nothing after this page.
+    """
+    timestamp, seen = _decode_cursor(cursor)
+    fetched = len(items)
+    items = [item for item in items if item["timestamp"] != timestamp or item["uid"] not in seen][:first]
+    if not items or fetched < first + len(seen):
+        return items, None
+    last = items[-1]["timestamp"]
+    uids = {item["uid"] for item in items if item["timestamp"] == last}
+    return items, _encode_cursor(last, uids | seen if last == timestamp else uids)
+
+def _prune(replies, depth):
+    # Drop the extra reply level fetched only to reach the deepest authors
+    for reply in replies:
+        if depth == 0:
+            reply.pop("replies", None)
+        else:
+            _prune(reply.get("replies", []), depth - 1)
+    return replies
+
+def _thread(data, depth, first, after):
+    if not data.get("post"):
+        return None
+    replies, next_cursor = _page(data.get("replies", []), first, after)
+    return {"post": data["post"][0], "replies": _prune(replies, depth), "next": next_cursor}
+
+def get_thread(post_id: str, depth: int = THREAD_DEPTH, first: int = FORUM_PAGE_SIZE, after: str = None, client=None):
+    """
+    A post with one page of its direct replies, oldest first, each expanded to
+    `depth` levels of nested replies. Returns {"post", "replies", "next"}; pass
+    `next` as `after` for the following page (None on the last one). None if
+    the post does not exist.
+    """
+    client = client or get_dgraph_client()
+    res = client.txn(read_only=True).query(THREAD_QUERY, variables=_thread_variables(post_id, depth, first, after))
+    return _thread(json.loads(res.json), depth, first, after)
+
+def list_recent_posts(first: int = FORUM_PAGE_SIZE, before: str = None, client=None):
+    """
+    Newest top-level posts. Returns (posts, next); pass `next` as `before` for
+    the following page.
+    """
+    client = client or get_dgraph_client()
+    res = client.txn(read_only=True).query(RECENT_POSTS_QUERY, variables=_recent_posts_variables(first, before))
+    return _page(json.loads(res.json).get("posts", []), first, before)
 
 # --- Course Prerequisites ---
-def add_prerequisite(course_id: str, prereq_id: str):
-    data = {
-      "uid": f"_:{course_id}",
-      "prerequisite": [{"uid": f"_:{prereq_id}"}]
-    }
-    client, stub = create_dgraph_client()
-    try:
-        client.txn().mutate(set_obj=data, commit_now=True)
-    finally:
-        stub.close()
+def add_prerequisite(course_id: str, prereq_id: str, client=None):
+    """
+    Make `prereq_id` a prerequisite of `course_id`. Raises ValueError if that
+    would create a cycle.
+    """
+    client = client or get_dgraph_client()
+    check_new_prerequisite(course_id, prereq_id, client)
+    _upsert_edge(client, ("Course", "course_id", course_id), "prerequisite",
+                 ("Course", "course_id", prereq_id))
+    invalidate_prerequisite_graph()
 
 # --- Course Completion Link ---
-def mark_course_completed(student_id: str, course_id: str):
-    data = {
-      "uid": f"_:{student_id}",
-      "completed": [{"uid": f"_:{course_id}"}]
-    }
-    client, stub = create_dgraph_client()
-    try:
-        client.txn().mutate(set_obj=data, commit_now=True)
-    finally:
-        stub.close()
\ No newline at end of file
+def mark_course_completed(student_id: str, course_id: str, client=None):
+    client = client or get_dgraph_client()
+    _upsert_edge(client, ("Student", "student_id", student_id), "completed",
+                 ("Course", "course_id", course_id))
@@ -1,4 +1,5 @@
 from db.cassandra_client import get_cassandra_session, KEYSPACE
+from db.logging_config import configure_logging
 import logging
 
 log = logging.getLogger(__name__)
@@ -13,15 +14,22 @@ def setup_cassandra_schema():
 
     session.set_keyspace(KEYSPACE)
 
-    # Create tables
+    # Create tables. user_activity_by_day, session_logs_by_day and
+    # quiz_attempts_by_quiz replace user_activity, session_logs and quiz_attempts,
+    # whose primary keys changed; the old tables are left in place and can be
+    # dropped once no longer needed.
     session.execute("""
-    CREATE TABLE IF NOT EXISTS user_activity (
+    CREATE TABLE IF NOT EXISTS user_activity_by_day (
         user_id text,
+        day date,
         timestamp timestamp,
         activity_type text,
         metadata map<text, text>,
-        PRIMARY KEY (user_id, timestamp)
-    ) WITH CLUSTERING ORDER BY (timestamp DESC);
+        PRIMARY KEY ((user_id, day), timestamp)
+    ) WITH CLUSTERING ORDER BY (timestamp DESC)
+      AND default_time_to_live = 7776000
+      AND compaction = {'class': 'TimeWindowCompactionStrategy',
+                        'compaction_window_unit': 'DAYS', 'compaction_window_size': 1};
     """)
 
     session.execute("""
@@ -36,25 +44,41 @@ def setup_cassandra_schema():
     """)
 
     session.execute("""
-    CREATE TABLE IF NOT EXISTS quiz_attempts (
+    CREATE TABLE IF NOT EXISTS quiz_attempts_by_quiz (
         user_id text,
         quiz_id text,
         attempt_timestamp timestamp,
         score float,
         responses map<text, text>,
+        PRIMARY KEY (user_id, quiz_id, attempt_timestamp)
+    ) WITH CLUSTERING ORDER BY (quiz_id ASC, attempt_timestamp DESC);
+    """)
+
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS quiz_attempt_summary (
+        user_id text,
+        quiz_id text,
+        latest_score float,
+        latest_attempt timestamp,
+        best_score float,
+        attempt_count int,
         PRIMARY KEY (user_id, quiz_id)
     );
     """)
 
     session.execute("""
-    CREATE TABLE IF NOT EXISTS session_logs (
+    CREATE TABLE IF NOT EXISTS session_logs_by_day (
         user_id text,
+        day date,
         login_timestamp timestamp,
         logout_timestamp timestamp,
         session_duration int,
         device_info text,
-        PRIMARY KEY (user_id, login_timestamp)
-    );
+        PRIMARY KEY ((user_id, day), login_timestamp)
+    ) WITH CLUSTERING ORDER BY (login_timestamp DESC)
+      AND default_time_to_live = 15552000
+      AND compaction = {'class': 'TimeWindowCompactionStrategy',
+                        'compaction_window_unit': 'DAYS', 'compaction_window_size': 7};
     """)
 
     session.execute("""
@@ -69,8 +93,68 @@ def setup_cassandra_schema():
     );
     """)
 
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS performance_counters (
+        user_id text,
+        course_id text,
+        lessons_completed counter,
+        scored_lessons counter,
+        score_sum counter,
+        PRIMARY KEY (user_id, course_id)
+    );
+    """)
+
+    # Direct messages: one partition per conversation per month, newest first
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS messages (
+        conversation_id text,
+        month text,
+        sent_at timeuuid,
+        sender_id text,
+        receiver_id text,
+        content text,
+        PRIMARY KEY ((conversation_id, month), sent_at)
+    ) WITH CLUSTERING ORDER BY (sent_at DESC)
+      AND compaction = {'class': 'TimeWindowCompactionStrategy',
+                        'compaction_window_unit': 'DAYS', 'compaction_window_size': 30};
+    """)
+
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS conversations (
+        conversation_id text PRIMARY KEY,
+        user_a text,
+        user_b text,
+        started_month text
+    );
+    """)
+
+    # Each user's conversations, most recent message first. A conversation has
+    # one row, keyed by its latest message; a new message deletes the old row.
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS inbox_by_time (
+        user_id text,
+        last_message_at timeuuid,
+        conversation_id text,
+        other_user_id text,
+        last_sender_id text,
+        preview text,
+        PRIMARY KEY (user_id, last_message_at, conversation_id)
+    ) WITH CLUSTERING ORDER BY (last_message_at DESC, conversation_id ASC);
+    """)
+
+    # Latest message time per (user, conversation): the inbox_by_time row to replace
+    session.execute("""
+    CREATE TABLE IF NOT EXISTS inbox_latest (
+        user_id text,
+        conversation_id text,
+        last_message_at timeuuid,
+        PRIMARY KEY (user_id, conversation_id)
+    );
+    """)
+
     log.info("✅ Cassandra schema setup completed.")
     print("✅ Cassandra keyspace and tables created.")
 
 if __name__ == "__main__":
+    configure_logging()
     setup_cassandra_schema()
\ No newline at end of file
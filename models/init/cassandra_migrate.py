@@ -0,0 +1,103 @@
+from db.cassandra_client import get_cassandra_session
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import SimpleStatement
+from datetime import datetime
+from itertools import islice
+import argparse
+import time
+
+# One-off copy of rows written before a table's primary key changed into the table
+# that replaced it. CREATE TABLE IF NOT EXISTS cannot re-key a table, so the new
+# layouts live under new names and existing history has to be copied across.
+# Rows keep their remaining retention: anything already past the new table's TTL
+# is skipped and the rest expires when it would have under the new table.
+# Re-running is safe; every row lands on the same primary key again.
+#
+# History kept outside the cluster (or exported from another one) can instead be
+# written as CSV/JSONL rows with the old columns, metadata as a JSON object, and
+# loaded with `python -m models.cassandra_bulk user_activity_by_day <file>` (or
+# session_logs_by_day); the day column is derived while loading. Those rows get
+# the new table's full TTL.
+
+DEFAULT_FETCH_SIZE = 1000
+DEFAULT_CONCURRENCY = 64
+WINDOW = 10000
+
+# old table -> (select, insert into the new table with a TTL, time column, retention in
+#               seconds (the new table's default_time_to_live), row -> insert values)
+MIGRATIONS = {
+    "user_activity": (
+        "SELECT user_id, timestamp, activity_type, metadata FROM user_activity",
+        """
+        INSERT INTO user_activity_by_day (user_id, day, timestamp, activity_type, metadata)
+        VALUES (?, ?, ?, ?, ?)
+        USING TTL ?
+        """,
+        "timestamp",
+        7776000,
+        lambda row: (row.user_id, row.timestamp.date(), row.timestamp, row.activity_type, row.metadata),
+    ),
+    "session_logs": (
+        "SELECT user_id, login_timestamp, logout_timestamp, session_duration, device_info FROM session_logs",
+        """
+        INSERT INTO session_logs_by_day (user_id, day, login_timestamp, logout_timestamp, session_duration,
+                                         device_info)
+        VALUES (?, ?, ?, ?, ?, ?)
+        USING TTL ?
+        """,
+        "login_timestamp",
+        15552000,
+        lambda row: (row.user_id, row.login_timestamp.date(), row.login_timestamp, row.logout_timestamp,
+                     row.session_duration, row.device_info),
+    ),
+}
+
+
+def _remaining_ttl(written_at, retention, now):
+    if retention is None:
+        return 0  # no TTL
+    remaining = int(retention - (now - written_at).total_seconds())
+    return remaining if remaining > 0 else None
+
+
+def migrate_table(session, table, fetch_size=DEFAULT_FETCH_SIZE, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Copy every row of the old `table` into its replacement, paging through the old
+    table `fetch_size` rows at a time.
+    """
+    select, insert, time_column, retention, values = MIGRATIONS[table]
+    stmt = session.prepare(insert)
+    rows = iter(session.execute(SimpleStatement(select, fetch_size=fetch_size)))
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    copied = expired = 0
+    while True:
+        chunk = list(islice(rows, WINDOW))
+        if not chunk:
+            break
+        params = []
+        for row in chunk:
+            ttl = _remaining_ttl(getattr(row, time_column), retention, now)
+            if ttl is None:
+                expired += 1
+            else:
+                params.append(values(row) + (ttl,))
+        execute_concurrent_with_args(session, stmt, params, concurrency=concurrency)
+        copied += len(params)
+        print(f"[{table}] {copied} rows copied, {expired} already expired")
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {table}: copied {copied} rows in {elapsed:.1f}s ({expired} past retention skipped)")
+    return {"copied": copied, "expired": expired, "seconds": elapsed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy rows from re-keyed Cassandra tables into their replacements.")
+    parser.add_argument("tables", nargs="*", choices=sorted(MIGRATIONS), help="default: all")
+    parser.add_argument("--fetch-size", type=int, default=DEFAULT_FETCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    args = parser.parse_args()
+    session = get_cassandra_session()
+    for table in args.tables or sorted(MIGRATIONS):
+        migrate_table(session, table, fetch_size=args.fetch_size, concurrency=args.concurrency)
+    session.cluster.shutdown()
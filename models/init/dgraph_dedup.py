@@ -0,0 +1,89 @@
+from db.dgraph_client import get_dgraph_client, close_dgraph_client
+from collections import defaultdict
+import json
+
+# One-off cleanup for graphs written before the upsert-based mutations in
+# models/dgraph_model.py: collapses nodes sharing the same external id into one.
+
+ID_PREDICATES = ["student_id", "course_id", "instructor_id", "assignment_id"]
+EDGE_PREDICATES = ["enrolled", "teaches", "assigned_to", "submitted", "messaged",
+                   "follows", "completed", "prerequisite"]
+SCALAR_PREDICATES = ["title", "name", "score"]
+
+
+def find_duplicates(client, id_pred, page_size=1000):
+    """
+    Page through every node carrying `id_pred` and return {id_value: [uids]} for the
+    ids held by more than one node. The lowest uid comes first and is kept on merge.
+    """
+    groups = defaultdict(list)
+    after = "0x0"
+    while True:
+        query = f"{{ nodes(func: has({id_pred}), first: {page_size}, after: {after}) {{ uid {id_pred} }} }}"
+        nodes = json.loads(client.txn(read_only=True).query(query).json)["nodes"]
+        for node in nodes:
+            groups[node[id_pred]].append(node["uid"])
+        if len(nodes) < page_size:
+            break
+        after = nodes[-1]["uid"]
+    return {key: sorted(uids, key=lambda uid: int(uid, 16))
+            for key, uids in groups.items() if len(uids) > 1}
+
+
+def merge_nodes(client, keeper, duplicates):
+    """
+    Re-point every edge into or out of `duplicates` at `keeper`, copy scalar values the
+    keeper is missing and delete the duplicate nodes, all in a single transaction.
+    """
+    edges = " ".join(f"{p} {{ uid }} ~{p} {{ uid }}" for p in EDGE_PREDICATES)
+    scalars = " ".join(SCALAR_PREDICATES)
+    uids = ", ".join([keeper] + duplicates)
+    query = f"{{ nodes(func: uid({uids})) {{ uid {scalars} {edges} }} }}"
+    nodes = {n["uid"]: n for n in json.loads(client.txn(read_only=True).query(query).json)["nodes"]}
+
+    merged = set(duplicates)
+
+    def resolve(uid):
+        return keeper if uid in merged else uid
+
+    keep = nodes.get(keeper, {})
+    set_nquads, del_nquads = [], []
+    for dup in duplicates:
+        node = nodes.get(dup, {})
+        for pred in SCALAR_PREDICATES:
+            if pred in node and pred not in keep:
+                keep[pred] = node[pred]
+                set_nquads.append(f"<{keeper}> <{pred}> {json.dumps(str(node[pred]))} .")
+        for pred in EDGE_PREDICATES:
+            for target in node.get(pred, []):
+                if resolve(target["uid"]) != keeper:
+                    set_nquads.append(f"<{keeper}> <{pred}> <{resolve(target['uid'])}> .")
+            for source in node.get(f"~{pred}", []):
+                if resolve(source["uid"]) != keeper:
+                    set_nquads.append(f"<{resolve(source['uid'])}> <{pred}> <{keeper}> .")
+                del_nquads.append(f"<{source['uid']}> <{pred}> <{dup}> .")
+        # `<dup> * * .` only covers the predicates in the node's dgraph.type, which
+        # need not list every edge it has (Instructor lacks teaches, Student
+        # submitted), so each known predicate is deleted explicitly as well
+        del_nquads.append(f"<{dup}> * * .")
+        del_nquads.extend(f"<{dup}> <{pred}> * ." for pred in
+                          ID_PREDICATES + EDGE_PREDICATES + SCALAR_PREDICATES + ["dgraph.type"])
+
+    txn = client.txn()
+    mutation = txn.create_mutation(set_nquads="\n".join(set_nquads), del_nquads="\n".join(del_nquads))
+    txn.do_request(txn.create_request(mutations=[mutation], commit_now=True))
+
+
+def dedup_dgraph_nodes(client=None):
+    client = client or get_dgraph_client()
+    for id_pred in ID_PREDICATES:
+        duplicates = find_duplicates(client, id_pred)
+        for key, uids in duplicates.items():
+            merge_nodes(client, uids[0], uids[1:])
+        print(f"✅ {id_pred}: merged {sum(len(u) - 1 for u in duplicates.values())} duplicate nodes "
+              f"across {len(duplicates)} ids.")
+
+
+if __name__ == "__main__":
+    dedup_dgraph_nodes()
+    close_dgraph_client()
@@ -5,10 +5,10 @@ def setup_dgraph_schema():
     client, stub = create_dgraph_client()
 
     schema = """
-    student_id: string @index(exact) .
-    instructor_id: string @index(exact) .
-    course_id: string @index(exact) .
-    assignment_id: string @index(exact) .
+    student_id: string @index(exact) @upsert .
+    instructor_id: string @index(exact) @upsert .
+    course_id: string @index(exact) @upsert .
+    assignment_id: string @index(exact) @upsert .
     name: string .
     title: string .
     enrolled: [uid] @reverse .
@@ -17,10 +17,19 @@ def setup_dgraph_schema():
     submitted: [uid] @reverse .
     follows: [uid] @reverse .
     messaged: [uid] @reverse .
+    completed: [uid] @reverse .
+    prerequisite: [uid] @reverse .
+    post_id: string @index(exact) @upsert .
+    user_id: string @index(exact) @upsert .
+    content: string .
+    timestamp: datetime @index(hour) .
+    author: uid @reverse .
+    replies: [uid] @reverse @count .
 
     type Student {
         student_id
         enrolled
+        completed
         follows
         messaged
     }
@@ -35,12 +44,26 @@ def setup_dgraph_schema():
         course_id
         title
         assigned_to
+        prerequisite
     }
 
     type Assignment {
         assignment_id
         submitted
     }
+
+    type Post {
+        post_id
+        author
+        content
+        timestamp
+        replies
+    }
+
+    type User {
+        user_id
+        messaged
+    }
     """
 
     client.alter(pydgraph.Operation(schema=schema))
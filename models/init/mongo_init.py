@@ -1,4 +1,5 @@
 from db.mongo_client import get_mongo_db
+from models.mongo_model import SESSION_MAX_AGE
 
 def setup_mongodb_collections():
     db = get_mongo_db()
@@ -10,15 +11,33 @@ def setup_mongodb_collections():
     # Sessions collection
     db.sessions.create_index([("user_id", 1)])
     db.sessions.create_index([("user_id", 1), ("login_timestamp", -1)])
+    # Removed by the TTL monitor once expires_at has passed (it runs about once a
+    # minute, so readers still check expires_at themselves)
+    db.sessions.create_index([("expires_at", 1)], expireAfterSeconds=0)
+    # Sessions created before expires_at existed get one from their login time
+    db.sessions.update_many(
+        {"expires_at": {"$exists": False}},
+        [{"$set": {"expires_at": {"$add": ["$login_timestamp", SESSION_MAX_AGE * 1000]}}}]
+    )
 
-    # Password resets
-    db.password_resets.create_index([("token", 1)], unique=True)
+    # Password resets: only a hash of the token is stored
+    if "token_1" in db.password_resets.index_information():
+        db.password_resets.drop_index("token_1")
+        db.password_resets.delete_many({"token_hash": {"$exists": False}})
+    db.password_resets.create_index([("token_hash", 1)], unique=True)
+    db.password_resets.create_index([("expires_at", 1)], expireAfterSeconds=0)
 
     # Courses
     db.courses.create_index([("title", "text"), ("description", "text")])
-    db.courses.create_index([("category", 1)])
+    db.courses.create_index([("category", 1), ("_id", 1)])
     db.courses.create_index([("tags", 1)])
     db.courses.create_index([("instructor_id", 1)])
+    db.courses.create_index([("category", 1), ("average_rating", -1), ("_id", 1)])
+    # Ratings moved to course_ratings; the embedded arrays were never written to
+    db.courses.update_many({"ratings": {"$size": 0}}, {"$unset": {"ratings": ""}})
+
+    # Course ratings, one per user and course
+    db.course_ratings.create_index([("course_id", 1), ("user_id", 1)], unique=True)
 
     # Lessons
     db.lessons.create_index([("course_id", 1)])
@@ -26,6 +45,16 @@ def setup_mongodb_collections():
     # Quizzes
     db.quizzes.create_index([("course_id", 1)])
 
+    # Natural keys of imported catalog documents (models/mongo_bulk.py); partial, so
+    # documents created through the app without an external_id are not indexed
+    for collection in (db.courses, db.lessons, db.quizzes):
+        collection.create_index([("external_id", 1)], unique=True,
+                                partialFilterExpression={"external_id": {"$exists": True}})
+
+    # Precomputed course-course similarities (models/course_similarity.py), keyed by
+    # Dgraph course_id; the incremental job looks up which courses list a changed one
+    db.course_similarities.create_index([("neighbors.course_id", 1)])
+
     # Certificates
     db.certificates.create_index([("user_id", 1)])
 
@@ -0,0 +1,142 @@
+from db.mongo_client import get_mongo_db
+from models.bulk_io import read_rows
+from models.mongo_model import course_cache
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+import argparse
+import json
+import time
+
+# Catalog importer for partner onboarding. Rows are streamed from CSV or JSONL and
+# upserted with unordered bulk_write in bounded batches, keyed on each row's
+# external_id, so re-running an import updates documents in place instead of
+# duplicating them. Lessons and quizzes refer to their course by
+# course_external_id; import courses first.
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _list(value):
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith("["):
+            return json.loads(value)
+        # CSV cells hold lists as "a|b|c"
+        return [item.strip() for item in value.split("|") if item.strip()]
+    return list(value)
+
+def _json(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+# kind -> (collection, field converters, fields set only when a document is first inserted)
+KINDS = {
+    "courses": (
+        "courses",
+        {"title": str, "description": str, "category": str, "tags": _list, "instructor_id": ObjectId},
+        {"lesson_ids": [], "rating_count": 0, "rating_sum": 0},
+    ),
+    "lessons": (
+        "lessons",
+        {"title": str, "content": str, "content_type": str, "resource_urls": _list},
+        {},
+    ),
+    "quizzes": (
+        "quizzes",
+        {"questions": _json},
+        {},
+    ),
+}
+
+
+def _resolve_courses(db, external_ids, course_ids):
+    """
+    Fill `course_ids` (external_id -> _id) for any of `external_ids` not already in it.
+    """
+    missing = [external_id for external_id in external_ids if external_id not in course_ids]
+    if missing:
+        for course in db.courses.find({"external_id": {"$in": missing}}, {"external_id": 1}):
+            course_ids[course["external_id"]] = course["_id"]
+
+
+def _upserts(kind, rows, course_ids, now):
+    _, converters, on_insert = KINDS[kind]
+    ops, imported = [], []
+    for row in rows:
+        # Only columns present in the row are written, so partial re-imports keep other fields
+        doc = {field: convert(row[field]) for field, convert in converters.items()
+               if row.get(field) not in (None, "")}
+        if kind != "courses":
+            course_id = course_ids.get(str(row["course_external_id"]))
+            if course_id is None:
+                continue
+            doc["course_id"] = course_id
+        doc["updated_at"] = now
+        ops.append(UpdateOne({"external_id": str(row["external_id"])},
+                             {"$set": doc, "$setOnInsert": dict(on_insert, created_at=now)},
+                             upsert=True))
+        imported.append(row)
+    return ops, imported
+
+
+def _link_lessons(db, rows, course_ids):
+    """
+    Append the batch's lessons to their courses' lesson_ids, in file order, with
+    one $addToSet per course.
+    """
+    external_ids = [str(row["external_id"]) for row in rows]
+    lesson_ids = {lesson["external_id"]: lesson["_id"]
+                  for lesson in db.lessons.find({"external_id": {"$in": external_ids}}, {"external_id": 1})}
+    per_course = defaultdict(list)
+    for row in rows:
+        per_course[course_ids[str(row["course_external_id"])]].append(lesson_ids[str(row["external_id"])])
+    db.courses.bulk_write([UpdateOne({"_id": course_id}, {"$addToSet": {"lesson_ids": {"$each": ids}}})
+                           for course_id, ids in per_course.items()], ordered=False)
+
+
+def bulk_import(db, kind, path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Upsert every row of `path` into the collection for `kind` ("courses",
+    "lessons" or "quizzes"), `batch_size` rows per bulk_write. Rows whose
+    course_external_id is unknown are skipped and counted.
+    """
+    collection = db[KINDS[kind][0]]
+    course_ids = {}
+    rows = read_rows(path)
+    start = time.perf_counter()
+    imported = skipped = 0
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        if kind != "courses":
+            _resolve_courses(db, {str(row["course_external_id"]) for row in chunk}, course_ids)
+        ops, written = _upserts(kind, chunk, course_ids, datetime.utcnow())
+        if ops:
+            collection.bulk_write(ops, ordered=False)
+        if kind == "lessons" and written:
+            _link_lessons(db, written, course_ids)
+        imported += len(written)
+        skipped += len(chunk) - len(written)
+        elapsed = time.perf_counter() - start
+        print(f"[{kind}] {imported} rows ({imported / elapsed:.0f} rows/sec)")
+
+    # Cached catalog reads in this process; other processes catch up within COURSE_CACHE_TTL
+    course_cache.clear()
+    elapsed = time.perf_counter() - start
+    print(f"✅ {kind}: imported {imported} rows in {elapsed:.1f}s"
+          + (f", skipped {skipped} with an unknown course" if skipped else ""))
+    return {"rows": imported, "skipped": skipped, "seconds": elapsed,
+            "rows_per_sec": imported / elapsed if elapsed else 0.0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import a course catalog into MongoDB.")
+    parser.add_argument("kind", choices=sorted(KINDS))
+    parser.add_argument("path", help="CSV or JSONL file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+    bulk_import(get_mongo_db(), args.kind, args.path, batch_size=args.batch_size)
@@ -1,41 +1,144 @@
-from db.mongo_client import get_mongo_db
+from db.connections import LazyConnection, mongo_db
+from models.cache import TTLCache
+from models.passwords import get_password_hasher
+from bson import json_util
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
-import bcrypt
+import base64
+import copy
+import hashlib
+import os
 import secrets
 from datetime import timedelta
 
-db = get_mongo_db()
+# Connected on first use through the shared registry, not at import time
+db = LazyConnection(mongo_db)
+
+# --- Course Catalog Cache ---
+# Read-through cache for get_course_details, browse_courses_by_category and
+# search_courses. Entries are tagged by course id, category and "search" so catalog
+# writes drop exactly the entries they affect; other processes see a write at most
+# COURSE_CACHE_TTL seconds later.
+#
+# Every hit is deep-copied, so list results are only cached when they are small:
+# a limit of at most COURSE_CACHE_MAX_ROWS and a projection. Unbounded or
+# full-document lists cost more to copy than to query and always go to Mongo.
+course_cache = TTLCache(maxsize=int(os.getenv("COURSE_CACHE_SIZE", "1024")),
+                        ttl=float(os.getenv("COURSE_CACHE_TTL", "60")))
+COURSE_CACHE_MAX_ROWS = int(os.getenv("COURSE_CACHE_MAX_ROWS", "100"))
+
+def _cached(key, tags, loader):
+    # Callers get their own copy so mutating a result cannot corrupt the cache
+    return copy.deepcopy(course_cache.get_or_load(key, loader, tags))
+
+def _cacheable(limit, projection):
+    return bool(projection) and limit is not None and 0 < limit <= COURSE_CACHE_MAX_ROWS
+
+def _projection_key(projection):
+    return tuple(sorted(projection.items())) if projection else None
+
+def invalidate_course_cache(course_id=None, category=None):
+    """
+    Drop cached entries for a course and/or a category, plus all keyword searches.
+    """
+    tags = ["search"]
+    if course_id:
+        tags.append(f"course:{course_id}")
+    if category:
+        tags.append(f"category:{category}")
+    course_cache.invalidate_tag(*tags)
+
+# --- Session Cache ---
+# validate_session runs on every authenticated request, so active sessions are kept
+# in-process for SESSION_CACHE_TTL seconds instead of being read from Mongo each time.
+# logout_user drops the entry here; other processes see a logout at most
+# SESSION_CACHE_TTL seconds later.
+#
+# Every session carries expires_at, which a TTL index uses to delete it: by default
+# SESSION_MAX_AGE seconds after login. With SESSION_IDLE_TIMEOUT > 0 sessions slide
+# instead: each one expires that many seconds after it was last validated. expires_at
+# is pushed forward in Mongo at most once per SESSION_TOUCH_INTERVAL, so keep the
+# interval well below the idle timeout.
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "30"))
+SESSION_MAX_AGE = float(os.getenv("SESSION_MAX_AGE", str(30 * 24 * 3600)))
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "0"))
+SESSION_TOUCH_INTERVAL = float(os.getenv("SESSION_TOUCH_INTERVAL", "60"))
+SESSION_PROJECTION = {"user_id": 1, "last_seen": 1, "expires_at": 1}
+session_cache = TTLCache(maxsize=int(os.getenv("SESSION_CACHE_SIZE", "10000")), ttl=SESSION_CACHE_TTL)
+
+def _session_expired(session, now):
+    expires_at = session.get("expires_at")
+    return expires_at is not None and expires_at <= now
+
+def _session_touch(session, now):
+    """
+    Fields to $set on a sliding session that is due for a bump, or None.
+    """
+    if SESSION_IDLE_TIMEOUT <= 0:
+        return None
+    last_seen = session.get("last_seen")
+    if last_seen and (now - last_seen).total_seconds() < SESSION_TOUCH_INTERVAL:
+        return None
+    return {"last_seen": now, "expires_at": now + timedelta(seconds=SESSION_IDLE_TIMEOUT)}
+
+def _new_session_fields(now):
+    return _session_touch({}, now) or {"expires_at": now + timedelta(seconds=SESSION_MAX_AGE)}
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
 
 # --- Users ---
 def login_user(email: str, password: str, ip_address: str, device_info: str):
+    hasher = get_password_hasher()
     user = db.users.find_one({"email": email})
-    if not user or not bcrypt.checkpw(password.encode(), user["hashed_password"].encode()):
+    if not user or not hasher.verify(password, user["hashed_password"]):
         return None
+    if hasher.needs_rehash(user["hashed_password"]):
+        # Cost factor changed since this hash was made; upgrade it while we have the password
+        db.users.update_one({"_id": user["_id"], "hashed_password": user["hashed_password"]},
+                            {"$set": {"hashed_password": hasher.hash(password)}})
+    now = datetime.utcnow()
     session = {
         "user_id": user["_id"],
-        "login_timestamp": datetime.utcnow(),
+        "login_timestamp": now,
         "ip_address": ip_address,
         "device_info": device_info,
-        "active": True
+        "active": True,
+        **_new_session_fields(now)
     }
-    session_id = db.sessions.insert_one(session).inserted_id
-    return str(session_id)
+    session_id = str(db.sessions.insert_one(session).inserted_id)
+    # Most logins are followed straight away by an authenticated request
+    session_cache.set(session_id, {k: session[k] for k in SESSION_PROJECTION if k in session})
+    return session_id
 
 def find_user_by_email(email):
     return db.users.find_one({"email": email})
 
+# Fields a user may see about their own account; never hashed_password
+USER_PROFILE_PROJECTION = {"username": 1, "email": 1, "role": 1, "profile": 1,
+                           "language_preference": 1, "bookmarks": 1}
+
+def _max_time_ms(timeout):
+    # Server-side limit for a read from a timeout in seconds; None leaves it unbounded
+    return None if timeout is None else max(int(timeout * 1000), 1)
+
+def get_user_profile(user_id: str, timeout=None):
+    if not ObjectId.is_valid(user_id):
+        return None
+    return db.users.find_one({"_id": ObjectId(user_id)}, USER_PROFILE_PROJECTION, max_time_ms=_max_time_ms(timeout))
+
 def register_user(username, email, password, role):
     if db.users.find_one({"$or": [{"username": username}, {"email": email}]}):
         print("User already exists.")
         return
     
-    hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    hashed_pw = get_password_hasher().hash(password)
     
     user = {
         "username": username,
         "email": email,
-        "hashed_password": hashed_pw.decode(),
+        "hashed_password": hashed_pw,
         "role": role,
         "language_preference": "en",
         "bookmarks": [],
@@ -62,15 +165,32 @@ def create_course(instructor_id, title, description, category, tags):
         "lesson_ids": [],
         "category": category,
         "tags": tags,
-        "ratings": [],
+        "rating_count": 0,
+        "rating_sum": 0,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
     result = db.courses.insert_one(course)
+    invalidate_course_cache(category=category)
     print(f"Course '{title}' created with ID: {result.inserted_id}")
 
 def add_lesson_to_course(course_id, lesson_id):
-    db.courses.update_one({"_id": ObjectId(course_id)}, {"$push": {"lesson_ids": ObjectId(lesson_id)}})
+    course = db.courses.find_one_and_update({"_id": ObjectId(course_id)},
+                                            {"$push": {"lesson_ids": ObjectId(lesson_id)}},
+                                            projection={"category": 1})
+    invalidate_course_cache(course_id, course and course.get("category"))
+
+def _lesson_count_pipeline(course_id):
+    return [
+        {"$match": {"_id": ObjectId(course_id)}},
+        {"$project": {"total": {"$size": {"$ifNull": ["$lesson_ids", []]}}}}
+    ]
+
+def count_course_lessons(course_id):
+    if not ObjectId.is_valid(course_id):
+        return None
+    result = list(db.courses.aggregate(_lesson_count_pipeline(course_id)))
+    return result[0]["total"] if result else None
 
 # --- Lessons ---
 def create_lesson(course_id, title, content, content_type, resource_urls):
@@ -95,6 +215,8 @@ def create_quiz(course_id, questions):
         "updated_at": datetime.utcnow()
     }
     result = db.quizzes.insert_one(quiz)
+    # Cached full course details list the course's quizzes
+    course_cache.invalidate_tag(f"course:{course_id}")
     print(f"Quiz created with ID: {result.inserted_id}")
 
 # --- Certificates ---
@@ -136,47 +258,319 @@ def create_password_reset(email: str):
     token = secrets.token_urlsafe(32)
     db.password_resets.insert_one({
         "user_id": user["_id"],
-        "token": token,
+        "token_hash": _token_hash(token),
         "created_at": datetime.utcnow(),
         "expires_at": datetime.utcnow() + timedelta(hours=1)
     })
     return token
 
 def reset_password(token: str, new_password: str):
-    pr = db.password_resets.find_one({
-        "token": token,
-        "expires_at": {"$gt": datetime.utcnow()}
-    })
+    # Consumed atomically, so a token can only ever be used once
+    pr = db.password_resets.find_one_and_delete(
+        {"token_hash": _token_hash(token), "expires_at": {"$gt": datetime.utcnow()}},
+        projection={"user_id": 1}
+    )
     if not pr:
         return False
-    hashed = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
+    hashed = get_password_hasher().hash(new_password)
     db.users.update_one({"_id": pr["user_id"]}, {"$set": {"hashed_password": hashed}})
-    db.password_resets.delete_one({"_id": pr["_id"]})
     return True
 
 # --- Search Courses by Title or Category ---
-def search_courses(keyword: str = None, category: str = None):
-    q = {}
+# Fields needed to render a course in a list; excludes descriptions, rating histograms and lesson_ids
+LIST_VIEW_PROJECTION = {"title": 1, "category": 1, "tags": 1, "instructor_id": 1, "created_at": 1,
+                        "average_rating": 1, "rating_count": 1}
+
+def _encode_cursor(sort_value, last_id):
+    return base64.urlsafe_b64encode(json_util.dumps([sort_value, last_id]).encode()).decode()
+
+def _decode_cursor(token):
+    return json_util.loads(base64.urlsafe_b64decode(token.encode()))
+
+def _course_pipeline(keyword=None, category=None, limit=None, cursor=None, projection=None):
+    """
+    Build the course listing pipeline. Keyword searches are ordered by
+    (textScore desc, _id asc), everything else by _id within the category, so a
+    cursor token from the last document of a page resumes right after it.
+    """
+    match = {}
     if keyword:
-        q["$text"] = {"$search": keyword}
+        match["$text"] = {"$search": keyword}
     if category:
-        q["category"] = category
-    cursor = db.courses.find(q)
+        match["category"] = category
+    pipeline = [{"$match": match}]
+
+    after = _decode_cursor(cursor) if cursor else None
     if keyword:
-        cursor = cursor.sort([("score", {"$meta": "textScore"})])
-    return list(cursor)
+        pipeline.append({"$addFields": {"score": {"$meta": "textScore"}}})
+        if after:
+            score, last_id = after
+            pipeline.append({"$match": {"$or": [{"score": {"$lt": score}},
+                                                {"score": score, "_id": {"$gt": last_id}}]}})
+        pipeline.append({"$sort": {"score": -1, "_id": 1}})
+    else:
+        if after:
+            if after[0] != category:
+                raise ValueError("Cursor does not belong to this category")
+            match["_id"] = {"$gt": after[1]}
+        pipeline.append({"$sort": {"_id": 1}})
+
+    if limit:
+        pipeline.append({"$limit": limit})
+    if projection:
+        pipeline.append({"$project": dict(projection, score=1) if keyword else projection})
+    return pipeline
+
+def _next_cursor(docs, keyword, category, limit):
+    if len(docs) < limit:
+        return None
+    last = docs[-1]
+    return _encode_cursor(last["score"] if keyword else category, last["_id"])
+
+def _course_query(keyword=None, category=None, limit=None, cursor=None, projection=None, batch_size=None):
+    pipeline = _course_pipeline(keyword, category, limit, cursor, projection)
+    return db.courses.aggregate(pipeline, batchSize=batch_size) if batch_size else db.courses.aggregate(pipeline)
+
+def _course_page(keyword, category, limit, cursor, projection):
+    docs = list(_course_query(keyword, category, limit, cursor, projection))
+    return docs, _next_cursor(docs, keyword, category, limit)
+
+def _search_cache_key(keyword, category, limit, projection):
+    key = ("search", keyword, category, limit, _projection_key(projection))
+    return key, ["search"] + ([f"category:{category}"] if category else [])
+
+def search_courses(keyword: str = None, category: str = None, limit: int = None, projection: dict = None):
+    load = lambda: list(_course_query(keyword, category, limit, projection=projection))
+    if not _cacheable(limit, projection):
+        return load()
+    key, tags = _search_cache_key(keyword, category, limit, projection)
+    return _cached(key, tags, load)
+
+def search_courses_page(keyword: str = None, category: str = None, limit: int = 20, cursor: str = None,
+                        projection: dict = LIST_VIEW_PROJECTION):
+    """
+    Return (courses, next_cursor). Pass next_cursor back to get the following page;
+    it is None on the last page.
+    """
+    return _course_page(keyword, category, limit, cursor, projection)
+
+def iter_search_courses(keyword: str = None, category: str = None, projection: dict = LIST_VIEW_PROJECTION,
+                        batch_size: int = 100):
+    """
+    Lazily stream every matching course, fetching `batch_size` documents at a time.
+    """
+    yield from _course_query(keyword, category, projection=projection, batch_size=batch_size)
 
 # --- Course Category Browsing ---
-def browse_courses_by_category(category: str):
-    return list(db.courses.find({"category": category}))
+def _category_cache_key(category, limit, projection):
+    return ("category", category, limit, _projection_key(projection)), [f"category:{category}"]
+
+def browse_courses_by_category(category: str, limit: int = None, projection: dict = None):
+    load = lambda: list(_course_query(category=category, limit=limit, projection=projection))
+    if not _cacheable(limit, projection):
+        return load()
+    key, tags = _category_cache_key(category, limit, projection)
+    return _cached(key, tags, load)
+
+def browse_courses_page(category: str, limit: int = 20, cursor: str = None, projection: dict = LIST_VIEW_PROJECTION):
+    return _course_page(None, category, limit, cursor, projection)
+
+def iter_courses_by_category(category: str, projection: dict = LIST_VIEW_PROJECTION, batch_size: int = 100):
+    yield from _course_query(category=category, projection=projection, batch_size=batch_size)
+
+# --- Session Validation ---
+def validate_session(session_id: str):
+    """
+    Return the user_id of an active, unexpired session, or None. Served from
+    session_cache when possible; see the Session Cache notes above.
+    """
+    if not ObjectId.is_valid(session_id):
+        return None
+    session = session_cache.get_or_load(
+        session_id, lambda: db.sessions.find_one({"_id": ObjectId(session_id), "active": True}, SESSION_PROJECTION))
+    now = datetime.utcnow()
+    if session is None or _session_expired(session, now):
+        session_cache.invalidate(session_id)
+        return None
+    touch = _session_touch(session, now)
+    if touch:
+        result = db.sessions.update_one({"_id": ObjectId(session_id), "active": True}, {"$set": touch})
+        if not result.matched_count:
+            # Logged out by another process since we cached it
+            session_cache.invalidate(session_id)
+            return None
+        session_cache.set(session_id, {**session, **touch})
+    return session["user_id"]
+
+# --- Course Ratings ---
+# Individual ratings live in course_ratings, one document per (course, user). The
+# course document only carries running totals (rating_count, rating_sum, a 1-5
+# rating_histogram and average_rating), updated in place on every rating.
+RATING_VALUES = range(1, 6)
+
+def _rating_deltas(previous, rating):
+    """
+    (count, sum, histogram) changes for a user's rating going from `previous`
+    (None if they had not rated the course) to `rating`.
+    """
+    if previous is None:
+        return 1, rating, {rating: 1}
+    if previous == rating:
+        return 0, 0, {}
+    return 0, rating - previous, {rating: 1, previous: -1}
+
+def _rating_stats_update(count, total, histogram):
+    """
+    Update pipeline applying the deltas and recomputing average_rating in the same
+    atomic write.
+    """
+    fields = {
+        "rating_count": {"$add": [{"$ifNull": ["$rating_count", 0]}, count]},
+        "rating_sum": {"$add": [{"$ifNull": ["$rating_sum", 0]}, total]},
+        "updated_at": datetime.utcnow()
+    }
+    for value, delta in histogram.items():
+        fields[f"rating_histogram.{value}"] = {"$add": [{"$ifNull": [f"$rating_histogram.{value}", 0]}, delta]}
+    return [
+        {"$set": fields},
+        {"$set": {"average_rating": {"$cond": [{"$gt": ["$rating_count", 0]},
+                                               {"$divide": ["$rating_sum", "$rating_count"]}, None]}}}
+    ]
+
+def _rating_rebuild_pipeline(course_id):
+    return [
+        {"$match": {"course_id": ObjectId(course_id)}},
+        {"$group": {"_id": "$rating", "count": {"$sum": 1}}}
+    ]
+
+def _rating_stats(groups):
+    histogram = {str(value): 0 for value in RATING_VALUES}
+    for group in groups:
+        histogram[str(group["_id"])] = group["count"]
+    count = sum(histogram.values())
+    total = sum(int(value) * n for value, n in histogram.items())
+    return {"rating_count": count, "rating_sum": total, "rating_histogram": histogram,
+            "average_rating": total / count if count else None}
+
+def _check_rating(rating):
+    if not isinstance(rating, int) or rating not in RATING_VALUES:
+        raise ValueError("Rating must be an integer from 1 to 5")
+
+def rate_course(user_id: str, course_id: str, rating: int):
+    """
+    Record (or change) a user's 1-5 rating of a course and fold it into the
+    course's rating statistics.
+    """
+    _check_rating(rating)
+    now = datetime.utcnow()
+    previous = db.course_ratings.find_one_and_update(
+        {"course_id": ObjectId(course_id), "user_id": ObjectId(user_id)},
+        {"$set": {"rating": rating, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+        projection={"rating": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    count, total, histogram = _rating_deltas(previous and previous["rating"], rating)
+    if not (count or total or histogram):
+        return
+    course = db.courses.find_one_and_update({"_id": ObjectId(course_id)},
+                                            _rating_stats_update(count, total, histogram),
+                                            projection={"category": 1})
+    invalidate_course_cache(course_id, course and course.get("category"))
+
+def rebuild_course_rating_stats(course_id: str):
+    """
+    Recompute a course's rating statistics from course_ratings, e.g. after an
+    interrupted rate_course left them out of step.
+    """
+    stats = _rating_stats(db.course_ratings.aggregate(_rating_rebuild_pipeline(course_id)))
+    course = db.courses.find_one_and_update({"_id": ObjectId(course_id)}, {"$set": stats},
+                                            projection={"category": 1})
+    invalidate_course_cache(course_id, course and course.get("category"))
+    return stats
+
+def _top_rated_cache_key(category, limit, min_ratings, projection):
+    key = ("top_rated", category, limit, min_ratings, _projection_key(projection))
+    return key, [f"category:{category}"]
+
+def _top_rated_filter(category, min_ratings):
+    return {"category": category, "rating_count": {"$gte": max(min_ratings, 1)}}
+
+def top_rated_courses(category: str, limit: int = 10, min_ratings: int = 1, projection: dict = LIST_VIEW_PROJECTION):
+    """
+    Highest average_rating first within a category, served by the
+    (category, average_rating, _id) index.
+    """
+    load = lambda: list(db.courses.find(_top_rated_filter(category, min_ratings), projection)
+                        .sort([("average_rating", -1), ("_id", 1)]).limit(limit))
+    if not _cacheable(limit, projection):
+        return load()
+    key, tags = _top_rated_cache_key(category, limit, min_ratings, projection)
+    return _cached(key, tags, load)
 
 # --- Logout ---
 def logout_user(session_id: str):
     db.sessions.update_one(
         {"_id": ObjectId(session_id)},
-        {"$set": {"active": False}}
+        {"$set": {"active": False, "expires_at": datetime.utcnow()}}
     )
+    session_cache.invalidate(session_id)
 
 # --- View Course Details
 def get_course_details(course_id: str):
-    return db.courses.find_one({"_id": ObjectId(course_id)})
+    return _cached(("course", course_id), [f"course:{course_id}"],
+                   lambda: db.courses.find_one({"_id": ObjectId(course_id)}))
+
+# Public instructor fields; never hashed_password, email or sessions data
+INSTRUCTOR_PROJECTION = {"username": 1, "profile": 1, "role": 1}
+
+def _course_detail_pipeline(course_id):
+    """
+    One round trip for a course detail page: the course plus its lessons (in
+    lesson_ids order, without content bodies), its quizzes (question counts only)
+    and the instructor's public profile. The localField/pipeline form of $lookup
+    needs MongoDB 5.0+ and lets each join use the foreign _id/course_id index.
+    """
+    return [
+        {"$match": {"_id": ObjectId(course_id)}},
+        {"$lookup": {
+            "from": "lessons",
+            "localField": "lesson_ids",
+            "foreignField": "_id",
+            "let": {"order": {"$ifNull": ["$lesson_ids", []]}},
+            "pipeline": [
+                {"$set": {"position": {"$indexOfArray": ["$$order", "$_id"]}}},
+                {"$sort": {"position": 1}},
+                {"$project": {"content": 0, "position": 0}}
+            ],
+            "as": "lessons"
+        }},
+        {"$lookup": {
+            "from": "quizzes",
+            "localField": "_id",
+            "foreignField": "course_id",
+            "pipeline": [
+                {"$project": {"question_count": {"$size": {"$ifNull": ["$questions", []]}},
+                              "created_at": 1, "updated_at": 1}}
+            ],
+            "as": "quizzes"
+        }},
+        {"$lookup": {
+            "from": "users",
+            "localField": "instructor_id",
+            "foreignField": "_id",
+            "pipeline": [{"$project": INSTRUCTOR_PROJECTION}],
+            "as": "instructor"
+        }},
+        {"$set": {"instructor": {"$arrayElemAt": ["$instructor", 0]}}}
+    ]
+
+def get_course_details_full(course_id: str):
+    """
+    get_course_details plus lessons, quizzes and instructor, in one aggregation.
+    Cached with the course; instructor profile edits show up within COURSE_CACHE_TTL.
+    """
+    if not ObjectId.is_valid(course_id):
+        return None
+    return _cached(("course_full", course_id), [f"course:{course_id}"],
+                   lambda: next(db.courses.aggregate(_course_detail_pipeline(course_id)), None))
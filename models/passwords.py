@@ -0,0 +1,101 @@
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
+import os
+import threading
+import bcrypt
+
+# bcrypt is deliberately slow (~100-300 ms per call at cost 12) and holds the calling
+# thread for the whole time. PasswordHasher moves hashing and verification onto a
+# process pool so logins scale with cores instead of being capped at one.
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def _verify(password, hashed):
+    try:
+        return bcrypt.checkpw(password.encode(), hashed.encode())
+    except ValueError:
+        # Malformed stored hash
+        return False
+
+
+def hash_rounds(hashed):
+    """
+    Cost factor of a bcrypt hash ("$2b$12$..." -> 12), or None if it is not one.
+    """
+    parts = hashed.split("$")
+    return int(parts[2]) if len(parts) > 3 and parts[2].isdigit() else None
+
+
+class PasswordHasher:
+    """
+    Hash and verify passwords on a process pool sized to the cores. Both a blocking
+    and an asyncio interface are provided; the pool is started on first use with the
+    spawn start method, so workers never inherit driver threads or sockets.
+    """
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=PASSWORD_HASH_WORKERS, executor=None):
+        self.rounds = rounds
+        self.workers = workers
+        self._executor = executor
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def hash(self, password):
+        return self._pool().submit(_hash, password, self.rounds).result()
+
+    def verify(self, password, hashed):
+        return self._pool().submit(_verify, password, hashed).result()
+
+    async def hash_async(self, password):
+        return await asyncio.get_running_loop().run_in_executor(self._pool(), _hash, password, self.rounds)
+
+    async def verify_async(self, password, hashed):
+        return await asyncio.get_running_loop().run_in_executor(self._pool(), _verify, password, hashed)
+
+    def needs_rehash(self, hashed):
+        """
+        True when `hashed` was made with a different cost factor than the current one.
+        """
+        return hash_rounds(hashed) != self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher():
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher()
+    return _hasher
+
+
+def set_password_hasher(hasher):
+    """
+    Replace the process-wide hasher, e.g. with a different cost factor or executor.
+    """
+    global _hasher
+    with _hasher_lock:
+        _hasher = hasher
@@ -0,0 +1,207 @@
+from db.dgraph_client import get_dgraph_client
+from collections import defaultdict
+import json
+import os
+import threading
+import time
+
+# Prerequisite engine over the Dgraph `prerequisite` edges. The whole graph is
+# small next to enrollments (one edge per course requirement), so it is loaded
+# once, checked for cycles and turned into a topological order plus the
+# transitive closure of every course, then cached in-process. add_prerequisite
+# drops the cache; other processes pick up new edges after
+# PREREQUISITE_CACHE_TTL seconds. Eligibility checks then cost one read of the
+# student's completed courses and a set difference.
+
+PREREQUISITE_CACHE_TTL = float(os.getenv("PREREQUISITE_CACHE_TTL", "300"))
+PREREQUISITE_PAGE_SIZE = 1000
+
+PREREQUISITES_QUERY = """
+query prerequisites($first: int, $after: string) {
+  courses(func: has(prerequisite), first: $first, after: $after) {
+    uid
+    course_id
+    prerequisite { course_id }
+  }
+}
+"""
+
+
+class PrerequisiteGraph:
+    """
+    Immutable snapshot of the prerequisite graph. `prerequisites` maps a
+    course_id to the course_ids it directly requires. Raises ValueError if the
+    edges contain a cycle.
+    """
+
+    def __init__(self, prerequisites):
+        self.prerequisites = {course: frozenset(required) for course, required in prerequisites.items()}
+        self.order = self._topological_order()
+        self._position = {course: i for i, course in enumerate(self.order)}
+        self._closure = {}
+        for course in self.order:
+            required = self.prerequisites.get(course, ())
+            self._closure[course] = frozenset(required).union(*(self._closure[p] for p in required))
+
+    def _topological_order(self):
+        """
+        Kahn's algorithm, prerequisites first; ties broken by course_id so the
+        order is stable between loads.
+        """
+        courses = set(self.prerequisites).union(*self.prerequisites.values())
+        pending = {course: len(self.prerequisites.get(course, ())) for course in courses}
+        unlocks = defaultdict(list)
+        for course, required in self.prerequisites.items():
+            for prereq in required:
+                unlocks[prereq].append(course)
+
+        ready = sorted(course for course, count in pending.items() if count == 0)
+        order = []
+        while ready:
+            course = ready.pop(0)
+            order.append(course)
+            for dependent in sorted(unlocks[course]):
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append(dependent)
+            ready.sort()
+        if len(order) < len(courses):
+            raise ValueError(f"Prerequisite cycle: {' -> '.join(self._find_cycle(set(courses) - set(order)))}")
+        return order
+
+    def _find_cycle(self, courses):
+        # Every course left over by Kahn's algorithm has a prerequisite that is also
+        # left over, so walking prerequisites from any of them must revisit one
+        path, seen = [], {}
+        course = min(courses)
+        while course not in seen:
+            seen[course] = len(path)
+            path.append(course)
+            course = min(p for p in self.prerequisites[course] if p in courses)
+        return path[seen[course]:] + [course]
+
+    def closure(self, course_id):
+        """
+        Every course that must be completed before `course_id`, directly or not.
+        """
+        return self._closure.get(course_id, frozenset())
+
+    def would_create_cycle(self, course_id, prereq_id):
+        return course_id == prereq_id or course_id in self.closure(prereq_id)
+
+    def missing(self, course_id, completed):
+        """
+        Direct prerequisites of `course_id` not in `completed`, in topological order.
+        """
+        return self._in_order(self.prerequisites.get(course_id, frozenset()) - set(completed))
+
+    def learning_path(self, course_id, completed):
+        """
+        The courses still to complete to reach `course_id` (ending with it), in an
+        order that satisfies every prerequisite along the way. Prerequisites of a
+        completed course are not followed, since completing it already met them.
+        """
+        completed = set(completed)
+        needed, pending = set(), [course_id]
+        while pending:
+            course = pending.pop()
+            if course in completed or course in needed:
+                continue
+            needed.add(course)
+            pending.extend(self.prerequisites.get(course, ()))
+        return self._in_order(needed)
+
+    def _in_order(self, courses):
+        return sorted(courses, key=lambda course: (self._position.get(course, -1), course))
+
+
+def _prerequisite_map(pages):
+    prerequisites = defaultdict(set)
+    for courses in pages:
+        for course in courses:
+            if "course_id" in course:
+                prerequisites[course["course_id"]].update(
+                    p["course_id"] for p in course.get("prerequisite", []) if "course_id" in p)
+    return prerequisites
+
+
+def _pages(client, page_size):
+    after = "0x0"
+    while True:
+        variables = {"$first": str(page_size), "$after": after}
+        courses = json.loads(client.txn(read_only=True).query(PREREQUISITES_QUERY, variables=variables).json)["courses"]
+        yield courses
+        if len(courses) < page_size:
+            return
+        after = courses[-1]["uid"]
+
+
+def load_prerequisite_graph(client=None, page_size=PREREQUISITE_PAGE_SIZE):
+    client = client or get_dgraph_client()
+    return PrerequisiteGraph(_prerequisite_map(_pages(client, page_size)))
+
+
+# --- Cache ---
+_cached_graph = None  # (graph, expires_at)
+_cache_lock = threading.Lock()
+
+
+def cached_graph():
+    """
+    The cached graph if it is still fresh, else None.
+    """
+    cached = _cached_graph
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    return None
+
+
+def cache_graph(graph):
+    global _cached_graph
+    with _cache_lock:
+        _cached_graph = (graph, time.monotonic() + PREREQUISITE_CACHE_TTL)
+    return graph
+
+
+def get_prerequisite_graph(client=None):
+    return cached_graph() or cache_graph(load_prerequisite_graph(client))
+
+
+def invalidate_prerequisite_graph():
+    global _cached_graph
+    with _cache_lock:
+        _cached_graph = None
+
+
+# --- Checks ---
+def check_new_prerequisite(course_id, prereq_id, client=None):
+    """
+    Raise ValueError if making `prereq_id` a prerequisite of `course_id` would
+    close a cycle.
+    """
+    if get_prerequisite_graph(client).would_create_cycle(course_id, prereq_id):
+        raise ValueError(f"{prereq_id} cannot be a prerequisite of {course_id}: "
+                         f"{course_id} is already required for {prereq_id}")
+
+
+def missing_prerequisites(student_id, course_id, client=None):
+    """
+    Direct prerequisites of `course_id` the student has not completed.
+    """
+    from models.dgraph_model import get_student_courses
+    completed = get_student_courses(student_id, client)["completed"]
+    return get_prerequisite_graph(client).missing(course_id, completed)
+
+
+def can_enroll(student_id, course_id, client=None):
+    return not missing_prerequisites(student_id, course_id, client)
+
+
+def plan_learning_path(student_id, course_id, client=None):
+    """
+    Ordered list of courses the student still has to complete to take
+    `course_id`, ending with `course_id` itself (empty if already completed).
+    """
+    from models.dgraph_model import get_student_courses
+    completed = get_student_courses(student_id, client)["completed"]
+    return get_prerequisite_graph(client).learning_path(course_id, completed)
@@ -2,13 +2,16 @@
 
 from db.mongo_client import get_mongo_db
 from db.cassandra_client import get_cassandra_session
+from db.logging_config import configure_logging
 from db.dgraph_client import create_dgraph_client
 from datetime import datetime
 import pydgraph
 
 from models.mongo_model import add_bookmark, set_language_preference, create_password_reset
 from models.cassandra_model import log_user_activity
-from models.dgraph_model import create_forum_post, reply_to_post, add_prerequisite, mark_course_completed
+from models.dgraph_model import (
+    create_forum_post, reply_to_post, add_prerequisite, mark_course_completed, _upsert_edge
+)
 
 # setup_all.py - Setup MongoDB, Cassandra, and Dgraph Models and Sample Data
 
@@ -67,7 +70,8 @@ def load_mongodb():
         "lesson_ids": [],
         "category": "Database",
         "tags": ["NoSQL", "Database", "MongoDB", "Cassandra", "Dgraph"],
-        "ratings": [],
+        "rating_count": 0,
+        "rating_sum": 0,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
@@ -147,8 +151,8 @@ def load_cassandra():
     session = get_cassandra_session()
 
     session.execute("""
-    INSERT INTO user_activity (user_id, timestamp, activity_type, metadata)
-    VALUES ('u123', toTimestamp(now()), 'login', {'ip': '192.168.1.1', 'device': 'Chrome'})
+    INSERT INTO user_activity_by_day (user_id, day, timestamp, activity_type, metadata)
+    VALUES ('u123', toDate(now()), toTimestamp(now()), 'login', {'ip': '192.168.1.1', 'device': 'Chrome'})
     """)
 
     session.execute("""
@@ -157,13 +161,13 @@ def load_cassandra():
     """)
 
     session.execute("""
-    INSERT INTO quiz_attempts (user_id, quiz_id, attempt_timestamp, score, responses)
+    INSERT INTO quiz_attempts_by_quiz (user_id, quiz_id, attempt_timestamp, score, responses)
     VALUES ('u123', 'q101', toTimestamp(now()), 85.0, {'q1': 'NoSQL DB'})
     """)
 
     session.execute("""
-    INSERT INTO session_logs (user_id, login_timestamp, logout_timestamp, session_duration, device_info)
-    VALUES ('u123', toTimestamp(now()), toTimestamp(now()), 45, 'Firefox on Linux')
+    INSERT INTO session_logs_by_day (user_id, day, login_timestamp, logout_timestamp, session_duration, device_info)
+    VALUES ('u123', toDate(now()), toTimestamp(now()), toTimestamp(now()), 45, 'Firefox on Linux')
     """)
 
     session.execute("""
@@ -182,39 +186,21 @@ def load_cassandra():
 def load_dgraph():
     client, stub = create_dgraph_client()
     set_dgraph_schema(client)
-    txn = client.txn()
 
-    data = {
-        "uid": "_:student123",
-        "dgraph.type": "Student",
-        "student_id": "u123",
-        "enrolled": [
-            {
-                "uid": "_:course123",
-                "dgraph.type": "Course",
-                "course_id": "c101",
-                "title": "Introduction to NoSQL"
-            }
-        ],
-        "follows": [
-            {
-                "uid": "_:instructor456",
-                "dgraph.type": "Instructor",
-                "instructor_id": "i456",
-                "name": "Dr. Smith"
-            }
-        ]
-    }
+    # Upserts keyed on the external ids, like the model functions below, so the
+    # sample nodes are never created twice
+    _upsert_edge(client, ("Student", "student_id", "u123"), "enrolled",
+                 ("Course", "course_id", "c101", {"title": "Introduction to NoSQL"}))
+    _upsert_edge(client, ("Student", "student_id", "u123"), "follows",
+                 ("Instructor", "instructor_id", "i456", {"name": "Dr. Smith"}))
+    print("✅ Dgraph sample data inserted.")
 
     create_forum_post("post1", "u123", "Welcome to Dgraph forum!")
     reply_to_post("post1", "reply1", "i456", "Thanks for joining.")
     add_prerequisite("c101", "c100")
     mark_course_completed("u123", "c101")
     print("✅ Dgraph forum/prereqs/completion seeded.")
-
-    txn.mutate(set_obj=data, commit_now=True)
     stub.close()
-    print("✅ Dgraph sample data inserted.")
 
 
 def set_dgraph_schema(client):
@@ -224,16 +210,26 @@ def set_dgraph_schema(client):
 
     # Define the new schema
     schema = """
-    student_id: string @index(exact) .
-    instructor_id: string @index(exact) .
-    course_id: string @index(exact) .
+    student_id: string @index(exact) @upsert .
+    instructor_id: string @index(exact) @upsert .
+    course_id: string @index(exact) @upsert .
     name: string .
     title: string .
     enrolled: [uid] @reverse .
     follows: [uid] @reverse .
+    completed: [uid] @reverse .
+    prerequisite: [uid] @reverse .
+    messaged: [uid] @reverse .
+    post_id: string @index(exact) @upsert .
+    user_id: string @index(exact) @upsert .
+    content: string .
+    timestamp: datetime @index(hour) .
+    author: uid @reverse .
+    replies: [uid] @reverse @count .
     type Student {
         student_id: string
         enrolled: [uid]
+        completed: [uid]
         follows: [uid]
     }
     type Instructor {
@@ -243,6 +239,18 @@ def set_dgraph_schema(client):
     type Course {
         course_id: string
         title: string
+        prerequisite: [uid]
+    }
+    type Post {
+        post_id: string
+        author: uid
+        content: string
+        timestamp: datetime
+        replies: [uid]
+    }
+    type User {
+        user_id: string
+        messaged: [uid]
     }
     """
     print("✅ Setting new Dgraph schema...")
@@ -251,6 +259,7 @@ def set_dgraph_schema(client):
 
 # --- Run All ---
 if __name__ == '__main__':
+    configure_logging()
     print("\n=== Setting up MongoDB, Cassandra, and Dgraph ===")
     setup_all()
 
@@ -0,0 +1,86 @@
+import pytest
+
+from models import cache
+from models.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_evicts_least_recently_used():
+    c = TTLCache(maxsize=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1  # "b" is now the oldest
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1
+    assert c.get("c") == 3
+    assert c.stats()["evictions"] == 1
+
+
+def test_overwrite_refreshes_recency():
+    c = TTLCache(maxsize=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.set("a", 10)
+    c.set("c", 3)
+    assert c.get("a") == 10
+    assert c.get("b") is None
+
+
+def test_entries_expire_after_ttl(clock):
+    c = TTLCache(ttl=60)
+    c.set("a", 1)
+    c.set("b", 2, ttl=5)
+    clock[0] += 5
+    assert c.get("b") is None
+    assert c.get("a") == 1
+    clock[0] += 55
+    assert c.get("a") is None
+    assert c.stats()["size"] == 0
+
+
+def test_invalidate_tag_drops_only_tagged_entries():
+    c = TTLCache()
+    c.set("search", 1, tags=["search"])
+    c.set("math", 2, tags=["search", "category:math"])
+    c.set("art", 3, tags=["category:art"])
+    c.invalidate_tag("category:math")
+    assert c.get("math") is None
+    assert c.get("search") == 1
+    c.invalidate_tag("search")
+    assert c.get("search") is None
+    assert c.get("art") == 3
+
+
+def test_tags_follow_evicted_and_replaced_entries():
+    c = TTLCache(maxsize=1)
+    c.set("a", 1, tags=["t"])
+    c.set("a", 2)
+    c.invalidate_tag("t")
+    assert c.get("a") == 2
+    c.set("b", 3, tags=["t"])  # evicts "a"
+    c.invalidate_tag("t")
+    assert c.stats()["size"] == 0
+
+
+def test_get_or_load_caches_values_but_not_none():
+    c = TTLCache()
+    calls = []
+
+    def load(value):
+        def loader():
+            calls.append(value)
+            return value
+        return loader
+
+    assert c.get_or_load("missing", load(None)) is None
+    assert c.get_or_load("missing", load(None)) is None
+    assert c.get_or_load("found", load(1)) == 1
+    assert c.get_or_load("found", load(2)) == 1
+    assert calls == [None, None, 1]
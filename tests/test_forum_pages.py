@@ -0,0 +1,33 @@
+from models.dgraph_model import _page, _recent_posts_variables, _thread_variables
+
+# Replies as the thread query returns them, oldest first; four share one timestamp
+REPLIES = [{"uid": f"0x{i}", "timestamp": ts} for i, ts in
+           enumerate(["t1", "t2", "t2", "t2", "t2", "t3", "t4"], start=1)]
+
+
+def _query(after, first):
+    # What THREAD_QUERY returns for _thread_variables: ge(timestamp, after), ordered, limited
+    variables = _thread_variables("p", 1, first, after)
+    timestamp, limit = variables["$after"], int(variables["$first"])
+    return [reply for reply in REPLIES if reply["timestamp"] >= timestamp][:limit]
+
+
+def test_pages_through_equal_timestamps_without_gaps_or_repeats():
+    seen, cursor = [], None
+    while True:
+        page, cursor = _page(_query(cursor, 2), 2, cursor)
+        seen.extend(reply["uid"] for reply in page)
+        if cursor is None:
+            break
+    assert seen == [reply["uid"] for reply in REPLIES]
+
+
+def test_short_page_has_no_cursor():
+    assert _page(REPLIES[:3], 5, None) == (REPLIES[:3], None)
+    assert _page([], 5, None) == ([], None)
+
+
+def test_cursor_overfetches_by_the_uids_already_returned():
+    _, cursor = _page(REPLIES[:3], 3, None)
+    assert _thread_variables("p", 1, 3, cursor)["$first"] == "5"
+    assert _recent_posts_variables(3, cursor) == {"$first": "5", "$before": "t2"}
@@ -0,0 +1,67 @@
+from collections import namedtuple
+
+from models.cassandra_model import (
+    MESSAGE_STATEMENTS, INBOX_STATEMENTS, conversation_id,
+    _message_writes, _previous_month, _split_inbox, _stale_removals, _timeuuid, _timeuuid_micros
+)
+
+InboxRow = namedtuple("InboxRow", "conversation_id last_message_at")
+
+# Statement names stand in for the prepared statements
+STATEMENTS = {name: name for name in MESSAGE_STATEMENTS + INBOX_STATEMENTS}
+
+
+def _names(writes):
+    return [stmt for stmt, _ in writes]
+
+
+def test_conversation_id_is_symmetric_and_unambiguous():
+    assert conversation_id("alice", "bob") == conversation_id("bob", "alice")
+    assert conversation_id("a:b", "c") != conversation_id("a", "b:c")
+
+
+def test_first_message_adds_both_inbox_rows():
+    sent_at = _timeuuid()
+    writes = _message_writes(STATEMENTS, "conv", "alice", "bob", "hi", sent_at, {})
+    assert _names(writes) == ["send_message",
+                              "set_inbox_latest", "add_inbox_entry",
+                              "set_inbox_latest", "add_inbox_entry"]
+    assert [params[0] for stmt, params in writes if stmt == "add_inbox_entry"] == ["alice", "bob"]
+
+
+def test_newer_message_replaces_the_previous_row():
+    previous, sent_at = _timeuuid(), _timeuuid()
+    writes = _message_writes(STATEMENTS, "conv", "alice", "bob", "hi", sent_at,
+                             {"alice": previous, "bob": previous})
+    removals = [params for stmt, params in writes if stmt == "remove_inbox_entry"]
+    assert removals == [(_timeuuid_micros(sent_at), "alice", previous, "conv"),
+                        (_timeuuid_micros(sent_at), "bob", previous, "conv")]
+
+
+def test_older_message_skips_an_inbox_showing_a_newer_one():
+    sent_at, newer = _timeuuid(), _timeuuid()
+    writes = _message_writes(STATEMENTS, "conv", "alice", "bob", "late", sent_at, {"bob": newer})
+    assert _names(writes) == ["send_message", "set_inbox_latest", "add_inbox_entry"]
+    assert all(params[0] == "alice" for stmt, params in writes[1:])
+
+
+def test_preview_is_truncated():
+    writes = _message_writes(STATEMENTS, "conv", "alice", "bob", "x" * 500, _timeuuid(), {})
+    preview = next(params[5] for stmt, params in writes if stmt == "add_inbox_entry")
+    assert len(preview) == 100
+
+
+def test_split_inbox_classifies_replaced_rows_as_stale():
+    old, new, other = _timeuuid(), _timeuuid(), _timeuuid()
+    rows = [InboxRow("conv", new), InboxRow("other", other), InboxRow("conv", old), InboxRow("unknown", old)]
+    current, stale = _split_inbox(rows, {"conv": new, "other": other})
+    assert current == [InboxRow("conv", new), InboxRow("other", other), InboxRow("unknown", old)]
+    assert stale == [InboxRow("conv", old)]
+    assert _stale_removals(STATEMENTS, "alice", stale, {"conv": new}) == [
+        ("remove_inbox_entry", (_timeuuid_micros(new), "alice", old, "conv"))]
+
+
+def test_previous_month_crosses_year_boundary():
+    assert _previous_month("2025-01") == "2024-12"
+    assert _previous_month("2025-10") == "2025-09"
+    assert _previous_month("2025-03") == "2025-02"
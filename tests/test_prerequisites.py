@@ -0,0 +1,72 @@
+import pytest
+
+from models.prerequisites import PrerequisiteGraph
+
+# A requires B requires C requires D; E requires B and F
+CHAIN = {"A": {"B"}, "B": {"C"}, "C": {"D"}, "E": {"B", "F"}}
+
+
+def test_topological_order_puts_prerequisites_first():
+    graph = PrerequisiteGraph(CHAIN)
+    position = {course: i for i, course in enumerate(graph.order)}
+    for course, required in CHAIN.items():
+        for prereq in required:
+            assert position[prereq] < position[course]
+
+
+def test_order_is_stable_between_loads():
+    assert PrerequisiteGraph(CHAIN).order == PrerequisiteGraph(dict(reversed(CHAIN.items()))).order
+
+
+def test_closure_is_transitive():
+    graph = PrerequisiteGraph(CHAIN)
+    assert graph.closure("A") == {"B", "C", "D"}
+    assert graph.closure("E") == {"B", "C", "D", "F"}
+    assert graph.closure("D") == frozenset()
+    assert graph.closure("unknown") == frozenset()
+
+
+def test_cycle_is_rejected_with_its_path():
+    with pytest.raises(ValueError, match="A -> B -> C -> A"):
+        PrerequisiteGraph({"A": {"B"}, "B": {"C"}, "C": {"A"}, "D": {"A"}})
+
+
+def test_self_prerequisite_is_a_cycle():
+    with pytest.raises(ValueError):
+        PrerequisiteGraph({"A": {"A"}})
+
+
+def test_would_create_cycle():
+    graph = PrerequisiteGraph(CHAIN)
+    assert graph.would_create_cycle("D", "A")
+    assert graph.would_create_cycle("A", "A")
+    assert not graph.would_create_cycle("A", "D")
+    assert not graph.would_create_cycle("F", "D")
+
+
+def test_missing_lists_direct_prerequisites_only():
+    graph = PrerequisiteGraph(CHAIN)
+    assert graph.missing("A", []) == ["B"]
+    assert graph.missing("A", ["B"]) == []
+    assert graph.missing("E", ["F"]) == ["B"]
+
+
+def test_learning_path_from_scratch():
+    assert PrerequisiteGraph(CHAIN).learning_path("A", []) == ["D", "C", "B", "A"]
+
+
+def test_learning_path_stops_at_completed_courses():
+    graph = PrerequisiteGraph(CHAIN)
+    assert graph.learning_path("A", ["B"]) == ["A"]
+    assert graph.learning_path("E", ["C"]) == ["B", "F", "E"]
+
+
+def test_learning_path_agrees_with_missing():
+    graph = PrerequisiteGraph(CHAIN)
+    for completed in ([], ["D"], ["C"], ["B"], ["B", "F"]):
+        path = graph.learning_path("E", completed)
+        assert (path == ["E"]) == (graph.missing("E", completed) == [])
+
+
+def test_learning_path_is_empty_once_completed():
+    assert PrerequisiteGraph(CHAIN).learning_path("A", ["A"]) == []